@@ -0,0 +1,77 @@
+from collections.abc import Callable
+from datetime import datetime
+from timeit import repeat
+from typing import Any
+
+from pydantic import BaseModel
+from socketio import packet  # type: ignore[import-untyped]
+
+from tmexio import TMEXIO, PydanticJSONPacket
+from tmexio.structures import ClientEvent
+
+PacketClass = type[packet.Packet]
+
+PAYLOAD: list[dict[str, Any]] = [
+    {
+        "id": f"{i:032x}",
+        "text": "hello " * 10,
+        "created": datetime(2000, 1, 1).isoformat(),
+        "tags": ["a", "b", "c"],
+        "score": i / 3,
+    }
+    for i in range(100)
+]
+
+
+class ItemModel(BaseModel):
+    id: str
+    text: str
+    created: datetime
+    tags: list[str]
+    score: float
+
+
+tmex = TMEXIO()
+
+
+@tmex.on("event")
+async def handle_event(items: list[ItemModel]) -> None:
+    pass
+
+
+def encode(packet_class: PacketClass) -> Callable[[], Any]:
+    def encode_inner() -> Any:
+        return packet_class(packet.EVENT, data=["event", PAYLOAD]).encode()
+
+    return encode_inner
+
+
+def decode(packet_class: PacketClass) -> Callable[[], Any]:
+    encoded = packet.Packet(packet.EVENT, data=["event", {"items": PAYLOAD}]).encode()
+    handler, _ = tmex.event_handlers["event"]
+
+    def decode_inner() -> Any:
+        event_name, *args = packet_class(encoded_packet=encoded).data
+        return handler.parse_body(ClientEvent(tmex.server, event_name, "sid", *args))
+
+    return decode_inner
+
+
+def measure(function: Callable[[], Any], number: int = 1000) -> float:
+    return min(repeat(function, number=number, repeat=5)) / number * 1e6
+
+
+def main() -> None:
+    packet_classes: dict[str, PacketClass] = {
+        "socketio.Packet": packet.Packet,
+        "tmexio.PydanticJSONPacket": PydanticJSONPacket,
+    }
+    print(f"{'serializer':<28}{'encode, us':>12}{'parse, us':>12}")  # noqa: T201
+    for name, packet_class in packet_classes.items():
+        encode_time = measure(encode(packet_class))
+        decode_time = measure(decode(packet_class))
+        print(f"{name:<28}{encode_time:>12.1f}{decode_time:>12.1f}")  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
@@ -198,3 +198,10 @@ async def test_deleting_not_found(
 ) -> None:
     assert_nodata_ack(await client.emit("delete-hello", {"hello_id": "not-found"}))
     assert listener_client.event_count() == 0
+
+
+def test_compiled_dispatch_map() -> None:
+    dispatch_map = tmex.compile()
+    assert dispatch_map.keys() == tmex.event_handlers.keys() - {"connect", "disconnect"}
+    with pytest.raises(TypeError):
+        dispatch_map["unknown"] = dispatch_map["*"]  # type: ignore[index]
@@ -0,0 +1,120 @@
+from asyncio import sleep
+from collections.abc import AsyncIterator
+from typing import Any
+
+import pytest
+from pydantic import TypeAdapter
+
+from tests.utils import AsyncSIOTestClient, AsyncSIOTestServer, assert_ack
+from tmexio import TMEXIO, EventException
+
+pytestmark = pytest.mark.anyio
+
+tmex = TMEXIO()
+tmex.enable_client_batches(max_entries=3)
+
+concurrent_tmex = TMEXIO()
+concurrent_tmex.enable_client_batches(concurrent=True)
+
+trace: list[str] = []
+odd_number = EventException(409, "Number is odd")
+
+
+@tmex.on("double", exceptions=[odd_number])
+@concurrent_tmex.on("double", exceptions=[odd_number])
+async def double(number: int) -> int:
+    trace.append(f"{number} started")
+    await sleep(0)
+    trace.append(f"{number} finished")
+    if number % 2:
+        raise odd_number
+    return number * 2
+
+
+@tmex.on("ping")
+async def ping() -> str:
+    return "pong"
+
+
+@pytest.fixture()
+async def client() -> AsyncIterator[AsyncSIOTestClient]:
+    trace.clear()
+    with AsyncSIOTestServer(server=tmex.backend).patch() as server:
+        async with server.connect_client() as client:
+            yield client
+
+
+async def test_client_batch(client: AsyncSIOTestClient) -> None:
+    assert_ack(
+        await client.emit(
+            "batch",
+            {
+                "entries": [
+                    ["double", {"number": 2}],
+                    ["double", {"number": 3}],
+                    ["ping", None],
+                ]
+            },
+        ),
+        expected_body=[[200, 4], [409, "Number is odd"], [200, "pong"]],
+    )
+    assert trace == ["2 started", "2 finished", "3 started", "3 finished"]
+
+
+@pytest.mark.parametrize(
+    ("entries", "expected_ack"),
+    [
+        pytest.param(
+            [["unknown", None]], [404, "Unknown event in batch"], id="unknown"
+        ),
+        pytest.param(
+            [["batch", None]], [422, "Batches can not be nested"], id="nested"
+        ),
+    ],
+)
+async def test_client_batch_entry_errors(
+    client: AsyncSIOTestClient, entries: list[Any], expected_ack: list[Any]
+) -> None:
+    assert_ack(
+        await client.emit("batch", {"entries": entries}),
+        expected_body=[expected_ack],
+    )
+
+
+@pytest.mark.parametrize(
+    "entry",
+    [pytest.param(["ping", None], id="valid"), pytest.param(None, id="invalid")],
+)
+async def test_client_batch_too_many_entries(
+    client: AsyncSIOTestClient, entry: Any
+) -> None:
+    # the count is checked before entries are validated
+    assert_ack(
+        await client.emit("batch", {"entries": [entry] * 4}),
+        expected_code=413,
+        expected_body="Batch can not have more than 3 entries",
+    )
+
+
+async def test_concurrent_client_batch() -> None:
+    trace.clear()
+    with AsyncSIOTestServer(server=concurrent_tmex.backend).patch() as server:
+        async with server.connect_client() as client:
+            assert_ack(
+                await client.emit(
+                    "batch",
+                    {"entries": [["double", {"number": 2}], ["double", {"number": 4}]]},
+                ),
+                expected_body=[[200, 4], [200, 8]],
+            )
+    assert trace.index("4 started") < trace.index("2 finished")
+
+
+def test_client_batch_spec() -> None:
+    _, spec = tmex.event_handlers["batch"]
+    assert spec.ack is not None
+    assert spec.ack.model is not None
+    assert [exception.code for exception in spec.exceptions] == [413, 422]
+    assert spec.body_model is not None
+    schema = TypeAdapter(spec.body_model).json_schema()
+    assert schema["properties"]["entries"]["maxItems"] == 3
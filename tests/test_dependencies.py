@@ -0,0 +1,211 @@
+from asyncio import sleep
+from collections.abc import AsyncIterator
+from typing import Annotated
+
+import pytest
+
+from tests.utils import AsyncSIOTestServer, assert_ack
+from tmexio import TMEXIO, DependencyCache, EventException, Sid, register_dependency
+
+pytestmark = pytest.mark.anyio
+
+tmex = TMEXIO()
+trace: list[str] = []
+
+
+@register_dependency()
+async def load_user() -> str:
+    trace.append("user started")
+    await sleep(0)
+    trace.append("user finished")
+    return "user"
+
+
+@register_dependency()
+async def load_room() -> AsyncIterator[str]:
+    trace.append("room entered")
+    yield "room"
+    trace.append("room exited")
+
+
+@register_dependency()
+async def load_permissions() -> AsyncIterator[str]:
+    trace.append("permissions entered")
+    yield "permissions"
+    trace.append("permissions exited")
+
+
+@tmex.on("concurrent", concurrent_dependencies=True)
+async def concurrent_handler(
+    user: Annotated[str, load_user],
+    room: Annotated[str, load_room],
+    permissions: Annotated[str, load_permissions],
+) -> str:
+    return f"{user} {room} {permissions}"
+
+
+@pytest.fixture()
+async def server() -> AsyncIterator[AsyncSIOTestServer]:
+    trace.clear()
+    with AsyncSIOTestServer(server=tmex.backend).patch() as server:
+        yield server
+
+
+async def test_concurrent_dependencies(server: AsyncSIOTestServer) -> None:
+    async with server.connect_client({"token": "token"}) as client:
+        assert_ack(
+            await client.emit("concurrent"),
+            expected_body="user room permissions",
+        )
+
+    assert trace.index("room entered") < trace.index("user finished")
+    # cleanup mirrors declaration order, not completion order
+    assert trace[-2:] == ["permissions exited", "room exited"]
+
+
+connection_trace: list[str] = []
+
+
+@register_dependency(scope="connection")
+async def get_current_user(sid: Sid, token: str) -> AsyncIterator[str]:
+    connection_trace.append("user loaded")
+    yield f"{token}-{sid}"
+    connection_trace.append("user released")
+
+
+CurrentUser = Annotated[str, get_current_user]
+
+
+@tmex.on("whoami")
+async def whoami(user: CurrentUser) -> str:
+    return user
+
+
+async def test_connection_scoped_dependency(server: AsyncSIOTestServer) -> None:
+    connection_trace.clear()
+
+    async with server.connect_client({"token": "token"}) as client:
+        for _ in range(2):
+            assert_ack(
+                await client.emit("whoami"),
+                expected_body=f"token-{client.sid}",
+            )
+        assert connection_trace == ["user loaded"]
+
+    assert connection_trace == ["user loaded", "user released"]
+    assert tmex.server.connection_scopes == {}
+
+
+hello_cache = DependencyCache(max_size=2)
+hello_loads: list[str] = []
+
+
+@register_dependency(cache=hello_cache)
+async def get_hello(hello_id: str) -> str:
+    hello_loads.append(hello_id)
+    return f"hello {hello_id}"
+
+
+@tmex.on("cached")
+async def cached_handler(hello: Annotated[str, get_hello]) -> str:
+    return hello
+
+
+async def test_cached_dependency(server: AsyncSIOTestServer) -> None:
+    hello_cache.clear()
+    hello_cache.reset_counters()
+    hello_loads.clear()
+
+    async with server.connect_client({"token": "token"}) as client:
+        for hello_id in ["1", "1", "2", "1", "3", "1"]:
+            assert_ack(
+                await client.emit("cached", {"hello_id": hello_id}),
+                expected_body=f"hello {hello_id}",
+            )
+        hello_cache.invalidate(hello_id="1")
+        await client.emit("cached", {"hello_id": "1"})
+
+    assert hello_loads == ["1", "2", "3", "1"]
+    assert (hello_cache.hits, hello_cache.misses, hello_cache.size) == (3, 4, 2)
+
+
+@pytest.mark.parametrize(
+    ("event_name", "expected_runner"),
+    [
+        pytest.param("whoami", "run_without_dependencies", id="no_dependencies"),
+        pytest.param("cached", "run_without_exit_stack", id="value_dependencies"),
+        pytest.param("concurrent", "run_with_exit_stack", id="contextual"),
+    ],
+)
+def test_runner_selection(event_name: str, expected_runner: str) -> None:
+    handler, _ = tmex.event_handlers[event_name]
+    assert handler.run.__name__ == expected_runner
+
+
+@tmex.on("whoami-again")
+async def whoami_again(user: CurrentUser, hello: Annotated[str, get_hello]) -> str:
+    return f"{user} {hello}"
+
+
+def test_dependencies_compiled_once() -> None:
+    handlers = [tmex.event_handlers[name][0] for name in ("cached", "whoami-again")]
+    dependencies = [dict(handler.dependency_definitions) for handler in handlers]
+    assert dependencies[0][get_hello.function] is dependencies[1][get_hello.function]
+
+    for handler in handlers:
+        assert handler.body_model is not None
+        assert handler.body_model.model_fields.keys() == {"hello_id"}
+
+
+unauthorized = EventException(401, "Unauthorized")
+
+
+@register_dependency(scope="connection", exceptions=[unauthorized])
+async def get_account(token: str) -> str:
+    return token
+
+
+account_tmex = TMEXIO()
+connect_tmex = TMEXIO()
+sid_connect_tmex = TMEXIO()
+
+
+@account_tmex.on("me")
+@connect_tmex.on("me")
+@sid_connect_tmex.on("me")
+async def me(account: Annotated[str, get_account]) -> str:
+    return account
+
+
+@connect_tmex.on_connect()
+async def connect(locale: str) -> None:
+    pass
+
+
+@sid_connect_tmex.on_connect()
+async def connect_sid(sid: Sid) -> None:
+    pass
+
+
+@pytest.mark.parametrize(
+    ("app", "expected_exceptions", "expected_fields"),
+    [
+        pytest.param(account_tmex, [401], {"token"}, id="without_connect"),
+        pytest.param(connect_tmex, [422, 401], {"locale", "token"}, id="with_connect"),
+        pytest.param(sid_connect_tmex, [401], {"token"}, id="connect_without_body"),
+    ],
+)
+def test_connection_dependencies_spec(
+    app: TMEXIO, expected_exceptions: list[int], expected_fields: set[str]
+) -> None:
+    _, spec = app.event_handlers["connect"]
+    assert [exception.code for exception in spec.exceptions] == expected_exceptions
+    assert isinstance(spec.body_model, type)
+    assert spec.body_model.model_fields.keys() == expected_fields
+
+
+async def test_connect_handler_without_body() -> None:
+    with AsyncSIOTestServer(server=sid_connect_tmex.backend).patch() as server:
+        async with server.connect_client({"token": "token"}) as client:
+            assert client.sid is not None
+            assert_ack(await client.emit("me"), expected_body="token")
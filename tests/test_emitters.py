@@ -0,0 +1,339 @@
+from collections.abc import AsyncIterator
+from typing import Annotated, Any
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from pydantic import BaseModel, TypeAdapter
+from socketio import packet  # type: ignore[import-untyped]
+from typing_extensions import TypedDict  # pydantic needs it before python 3.12
+
+from tests.utils import AsyncSIOTestClient, AsyncSIOTestServer
+from tmexio import (
+    TMEXIO,
+    ConflatingEmitter,
+    Conflator,
+    DeltaEmitter,
+    DeltaTracker,
+    PydanticJSONPacket,
+)
+from tmexio.structures import ClientEvent
+
+pytestmark = pytest.mark.anyio
+
+tmex = TMEXIO()
+
+
+class UpdateModel(BaseModel):
+    text: str
+
+
+update_emitter = tmex.register_server_emitter(UpdateModel, "update")
+
+
+class UpdateDict(TypedDict):
+    text: str
+
+
+dict_emitter = tmex.register_server_emitter(UpdateDict, "update-dict")
+
+
+class EntityModel(BaseModel):
+    id: int
+    text: str
+
+
+entity_conflator = Conflator(interval=0, key=lambda entity: entity.id)
+entity_emitter = tmex.register_server_emitter(
+    EntityModel, "entity", conflator=entity_conflator
+)
+
+duplex_conflator = Conflator(interval=60)
+
+
+@tmex.on("update-entity")
+async def update_entity(
+    text: str,
+    duplex_emitter: Annotated[ConflatingEmitter[EntityModel], duplex_conflator],
+) -> None:
+    await duplex_emitter.emit(EntityModel(id=1, text=text), target="entities")
+
+
+@pytest.fixture()
+async def server() -> AsyncIterator[AsyncSIOTestServer]:
+    with AsyncSIOTestServer(server=tmex.backend).patch() as server:
+        yield server
+
+
+async def enter_rooms(client: AsyncSIOTestClient, *rooms: str) -> None:
+    for room in rooms:
+        await tmex.server.enter_room(sid=client.sid, room=room)
+
+
+async def test_prepared_emit(server: AsyncSIOTestServer) -> None:
+    async with (
+        server.connect_client() as first,
+        server.connect_client() as second,
+        server.connect_client() as third,
+    ):
+        await enter_rooms(first, "a", "b")
+        await enter_rooms(second, "b")
+        await enter_rooms(third, "c")
+
+        emitter = update_emitter.extract(ClientEvent(tmex.server, "", first.sid))
+        with patch.object(
+            packet.Packet, "encode", autospec=True, side_effect=packet.Packet.encode
+        ) as mock_encode:
+            prepared = emitter.prepare(UpdateModel(text="hello"))
+            await emitter.emit_prepared(prepared, target=["a", "b"])
+            await emitter.emit_prepared(prepared, target=[third.sid])
+            await emitter.emit_prepared(prepared, target="b", exclude_self=True)
+        mock_encode.assert_called_once()
+
+        expected: dict[AsyncSIOTestClient, list[Any]] = {
+            first: [{"text": "hello"}],
+            second: [{"text": "hello"}, {"text": "hello"}],
+            third: [{"text": "hello"}],
+        }
+        for client, events in expected.items():
+            assert client.events == {"update": events}
+
+
+async def test_typed_dict_emit(server: AsyncSIOTestServer) -> None:
+    async with server.connect_client() as client:
+        emitter = dict_emitter.extract(ClientEvent(tmex.server, "", client.sid))
+        await emitter.emit(UpdateDict(text="hello"), target=client.sid)
+        await emitter.emit_prepared(emitter.prepare({"text": "again"}))
+        assert client.events == {"update-dict": [{"text": "hello"}, {"text": "again"}]}
+
+
+async def test_prepared_emit_public_fallback(server: AsyncSIOTestServer) -> None:
+    async with server.connect_client() as client:
+        emitter = update_emitter.extract(ClientEvent(tmex.server, "", client.sid))
+        prepared = emitter.prepare(UpdateModel(text="fallback"))
+        # emit_prepared falls back to the public emit without the private API
+        with (
+            patch.object(tmex.backend, "_send_eio_packet", None),
+            patch.object(tmex.backend, "emit", AsyncMock()) as mock_emit,
+        ):
+            await emitter.emit_prepared(prepared, target="a", exclude_self=True)
+        mock_emit.assert_awaited_once_with(
+            event="update",
+            data=prepared.data,
+            to="a",
+            skip_sid=[client.sid],
+            namespace=prepared.namespace,
+        )
+
+
+async def test_multi_target_emit(server: AsyncSIOTestServer) -> None:
+    async with (
+        server.connect_client() as first,
+        server.connect_client() as second,
+        server.connect_client() as third,
+    ):
+        await enter_rooms(first, "a", "b")
+        await enter_rooms(second, "a", "b")
+        await enter_rooms(third, "b", "c")
+
+        emitter = update_emitter.extract(ClientEvent(tmex.server, "", first.sid))
+        await emitter.emit(UpdateModel(text="rooms"), target=["a", "b", "c"])
+        await emitter.emit(
+            UpdateModel(text="skipped"),
+            target=("b", "c"),
+            skip_sid=[third.sid],
+            exclude_self=True,
+        )
+        await emitter.emit(UpdateModel(text="nobody"), target=[])
+
+        expected: dict[AsyncSIOTestClient, list[Any]] = {
+            first: [{"text": "rooms"}],
+            second: [{"text": "rooms"}, {"text": "skipped"}],
+            third: [{"text": "rooms"}],
+        }
+        for client, events in expected.items():
+            assert client.events == {"update": events}
+
+
+async def test_conflating_emitter(server: AsyncSIOTestServer) -> None:
+    async with server.connect_client() as client:
+        await enter_rooms(client, "entities")
+
+        emitter = entity_emitter.extract(ClientEvent(tmex.server, "", client.sid))
+        assert isinstance(emitter, ConflatingEmitter)
+        for i in range(10):
+            await emitter.emit(EntityModel(id=i % 2, text=str(i)), target="entities")
+        assert client.events == {}
+
+        assert entity_conflator.flush_task is not None
+        await entity_conflator.flush_task
+        assert client.events == {
+            "entity": [{"id": 0, "text": "8"}, {"id": 1, "text": "9"}]
+        }
+
+
+async def test_shared_conflator(server: AsyncSIOTestServer) -> None:
+    conflator = Conflator(interval=60)
+    async with server.connect_client() as client:
+        event = ClientEvent(tmex.server, "", client.sid)
+        emitters = [
+            ConflatingEmitter[UpdateModel](
+                socket=event.socket,
+                event_name=event_name,
+                adapter=TypeAdapter(UpdateModel),
+                conflator=conflator,
+            )
+            for event_name in ("a", "b")
+        ]
+        for text in ("first", "second"):
+            for emitter in emitters:
+                await emitter.emit(UpdateModel(text=text), target=client.sid)
+
+        await conflator.flush()
+        # no key: only the latest update of each event is sent
+        assert client.events == {"a": [{"text": "second"}], "b": [{"text": "second"}]}
+
+
+async def test_duplex_conflating_emitter(server: AsyncSIOTestServer) -> None:
+    async with server.connect_client() as client:
+        await enter_rooms(client, "entities")
+
+        for text in ["first", "second", "third"]:
+            await client.emit("update-entity", {"text": text})
+        assert client.events == {}
+
+        await duplex_conflator.flush()
+        assert client.events == {"update-entity": [{"id": 1, "text": "third"}]}
+        assert duplex_conflator.flush_task is None
+
+
+batched_tmex = TMEXIO(serializer=PydanticJSONPacket)
+batcher = batched_tmex.enable_emit_batching()
+batched_emitter = batched_tmex.register_server_emitter(UpdateModel, "update")
+
+
+async def test_batched_emits() -> None:
+    with AsyncSIOTestServer(server=batched_tmex.backend).patch() as server:
+        async with (
+            server.connect_client() as first,
+            server.connect_client() as second,
+            server.connect_client() as third,
+        ):
+            for client, rooms in [(first, "ab"), (second, "b"), (third, "c")]:
+                for room in rooms:
+                    await batched_tmex.server.enter_room(sid=client.sid, room=room)
+
+            emitter = batched_emitter.extract(
+                ClientEvent(batched_tmex.server, "", first.sid)
+            )
+            await emitter.emit(UpdateModel(text="a"), target="a")
+            await emitter.emit(UpdateModel(text="b"), target="b")
+            await emitter.emit(UpdateModel(text="c"), target=["a", "c"])
+            assert first.events == second.events == third.events == {}
+
+            assert batcher.flush_task is not None
+            await batcher.flush_task
+
+            assert first.events == {
+                "batch": [
+                    [
+                        ["update", {"text": "a"}],
+                        ["update", {"text": "b"}],
+                        ["update", {"text": "c"}],
+                    ]
+                ]
+            }
+            assert second.events == {"update": [{"text": "b"}]}
+            assert third.events == {"update": [{"text": "c"}]}
+
+    assert "batch" in batched_tmex.event_emitters
+
+
+async def test_unbatched_sends_keep_order() -> None:
+    with AsyncSIOTestServer(server=batched_tmex.backend).patch() as server:
+        async with server.connect_client() as client:
+            emitter = batched_emitter.extract(
+                ClientEvent(batched_tmex.server, "", client.sid)
+            )
+            await emitter.emit(UpdateModel(text="batched"), target=client.sid)
+            await emitter.emit_prepared(emitter.prepare(UpdateModel(text="prepared")))
+            # the pending batch is flushed before the prepared event is sent
+            assert client.events == {
+                "update": [{"text": "batched"}, {"text": "prepared"}]
+            }
+            assert batcher.pending == {}
+            assert batcher.flush_task is None
+
+
+class DocumentModel(BaseModel):
+    id: int
+    title: str
+    text: str
+
+
+document_tracker = DeltaTracker(key=lambda document: document.id)
+document_emitter = tmex.register_server_emitter(
+    DocumentModel, "document", delta_tracker=document_tracker
+)
+
+
+async def test_delta_emitter(server: AsyncSIOTestServer) -> None:
+    document_tracker.clear()
+    text = "lorem ipsum " * 10
+
+    async with server.connect_client() as first, server.connect_client() as second:
+        await enter_rooms(first, "documents")
+        emitter = document_emitter.extract(ClientEvent(tmex.server, "", first.sid))
+        assert isinstance(emitter, DeltaEmitter)
+
+        for title, new_text in [("a", text), ("b", text), ("b", text), ("c", "c")]:
+            await emitter.emit(
+                DocumentModel(id=1, title=title, text=new_text), target="documents"
+            )
+        assert first.events == {
+            "document": [
+                {"key": 1, "snapshot": {"id": 1, "title": "a", "text": text}},
+                {
+                    "key": 1,
+                    "patch": [{"op": "replace", "path": "/title", "value": "b"}],
+                },
+                {"key": 1, "snapshot": {"id": 1, "title": "c", "text": "c"}},
+            ]
+        }
+
+        await enter_rooms(second, "documents")
+        await emitter.emit_snapshot(second.sid, target="documents", key=1)
+        assert second.events == {
+            "document": [{"key": 1, "snapshot": {"id": 1, "title": "c", "text": "c"}}]
+        }
+
+
+async def test_shared_delta_tracker(server: AsyncSIOTestServer) -> None:
+    tracker = DeltaTracker(max_states=2)
+    async with server.connect_client() as client:
+        event = ClientEvent(tmex.server, "", client.sid)
+        emitters = [
+            DeltaEmitter[UpdateModel](
+                socket=event.socket,
+                event_name=event_name,
+                adapter=TypeAdapter(UpdateModel),
+                tracker=tracker,
+            )
+            for event_name in ("da", "db", "dc")
+        ]
+        for emitter in emitters:
+            await emitter.emit(UpdateModel(text="hello"), target=client.sid)
+        assert len(tracker.states) == 2  # the state of "da" is evicted
+
+        await emitters[0].emit(UpdateModel(text="again"), target=client.sid)
+        snapshot = {"key": None, "snapshot": {"text": "hello"}}
+        assert client.events == {
+            "da": [snapshot, {"key": None, "snapshot": {"text": "again"}}],
+            "db": [snapshot],
+            "dc": [snapshot],
+        }
+
+
+def test_delta_emitter_spec() -> None:
+    schema = tmex.event_emitters["document"].body_model
+    assert isinstance(schema, TypeAdapter)
+    assert set(schema.json_schema()["properties"]) == {"key", "snapshot", "patch"}
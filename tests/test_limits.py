@@ -0,0 +1,238 @@
+from asyncio import Event, create_task, gather, sleep
+from collections.abc import AsyncIterator, Hashable
+from time import monotonic
+from typing import Annotated
+
+import pytest
+
+from tests.utils import AsyncSIOTestServer, assert_ack
+from tmexio import (
+    TMEXIO,
+    ConcurrencyLimits,
+    Sid,
+    TokenBucketStore,
+    rate_limit,
+    register_dependency,
+)
+from tmexio.limits import ConcurrencyGuard, ConcurrencyLimit
+
+pytestmark = pytest.mark.anyio
+
+tmex = TMEXIO(concurrency_limits=ConcurrencyLimits(total=2, per_sid=1, max_queued=1))
+release_event: Event
+
+
+@tmex.on("wait")
+async def wait_for_release() -> str:
+    await release_event.wait()
+    return "released"
+
+
+@pytest.fixture()
+async def server() -> AsyncIterator[AsyncSIOTestServer]:
+    global release_event  # noqa: WPS420
+    release_event = Event()  # bound to the loop of the current test
+    with AsyncSIOTestServer(server=tmex.backend).patch() as server:
+        yield server
+
+
+async def test_per_sid_limit(server: AsyncSIOTestServer) -> None:
+    async with server.connect_client() as client:
+        running = create_task(client.emit("wait"))
+        queued = create_task(client.emit("wait"))
+        await sleep(0)
+
+        assert_ack(
+            await client.emit("wait"),
+            expected_code=429,
+            expected_body="Too many concurrent events",
+        )
+
+        release_event.set()
+        for ack in await gather(running, queued):
+            assert_ack(ack, expected_body="released")
+
+    assert tmex.concurrency_guard is not None
+    assert tmex.concurrency_guard.sid_limits == {}
+
+
+batch_tmex = TMEXIO(concurrency_limits=ConcurrencyLimits(per_sid=1))
+batch_tmex.enable_client_batches(concurrent=True)
+
+
+@batch_tmex.on("count")
+async def count_running() -> int:
+    await sleep(0)
+    return 1
+
+
+async def test_limited_batch_entries() -> None:
+    with AsyncSIOTestServer(server=batch_tmex.backend).patch() as server:
+        async with server.connect_client() as client:
+            code, acks = await client.emit("batch", {"entries": [["count", None]] * 5})
+
+    assert code == 200
+    assert acks[0] == [200, 1]
+    assert acks[1:] == [[429, "Too many concurrent events"]] * 4
+
+
+async def test_total_limit(server: AsyncSIOTestServer) -> None:
+    async with (
+        server.connect_client() as first,
+        server.connect_client() as second,
+        server.connect_client() as third,
+        server.connect_client() as fourth,
+    ):
+        tasks = [create_task(client.emit("wait")) for client in (first, second, third)]
+        await sleep(0)
+
+        assert_ack(
+            await fourth.emit("wait"),
+            expected_code=503,
+            expected_body="Server is overloaded",
+        )
+
+        release_event.set()
+        for ack in await gather(*tasks):
+            assert_ack(ack, expected_body="released")
+
+
+async def test_cancelled_waiter() -> None:
+    limit = ConcurrencyLimit(1, 1, error=ConcurrencyGuard.overloaded_error)
+    await limit.acquire()
+    waiter = create_task(limit.acquire())
+    await sleep(0)
+    waiter.cancel()
+    await sleep(0)
+
+    limit.release()
+    assert limit.is_idle
+
+
+def test_limits_spec() -> None:
+    _, spec = tmex.event_handlers["wait"]
+    assert [exception.code for exception in spec.exceptions] == [422, 429, 503]
+
+
+cleanup_trace: list[str] = []
+
+
+@register_dependency()
+async def open_session() -> AsyncIterator[str]:
+    cleanup_trace.append("opened")
+    try:
+        yield "session"
+    finally:
+        cleanup_trace.append("closed")
+
+
+@tmex.on("slow", timeout=0.01)
+async def slow_handler(session: Annotated[str, open_session]) -> str:
+    await sleep(1)
+    return session
+
+
+@tmex.on("fast", timeout=1)
+async def fast_handler() -> str:
+    return "fast"
+
+
+async def test_handler_timeout(server: AsyncSIOTestServer) -> None:
+    cleanup_trace.clear()
+    tmex.server.exception_reporter.reset()
+    async with server.connect_client() as client:
+        assert_ack(
+            await client.emit("slow"),
+            expected_code=504,
+            expected_body="Event handler timed out",
+        )
+        assert_ack(await client.emit("fast"), expected_body="fast")
+    assert cleanup_trace == ["opened", "closed"]
+    assert tmex.server.exception_reporter.counters == {}
+
+
+def test_timeout_spec() -> None:
+    _, spec = tmex.event_handlers["slow"]
+    assert 504 in {exception.code for exception in spec.exceptions}
+
+
+def room_key(sid: Sid, room_id: int) -> Hashable:
+    return sid, room_id
+
+
+@tmex.on(
+    "post-message", dependencies=[rate_limit(rate=0.001, capacity=2, key=room_key)]
+)
+async def post_message(room_id: int, text: str) -> str:
+    return f"{room_id}: {text}"
+
+
+async def test_rate_limit(server: AsyncSIOTestServer) -> None:
+    async with server.connect_client() as client:
+        for room_id in [1, 1, 2]:
+            assert_ack(
+                await client.emit("post-message", {"room_id": room_id, "text": "hi"}),
+                expected_body=f"{room_id}: hi",
+            )
+        assert_ack(
+            await client.emit("post-message", {"room_id": 1, "text": "hi"}),
+            expected_code=429,
+            expected_body="Rate limit exceeded",
+        )
+
+    _, spec = tmex.event_handlers["post-message"]
+    assert "Rate limit exceeded" in {
+        exception.ack_body for exception in spec.exceptions
+    }
+
+
+def test_token_bucket_eviction() -> None:
+    store = TokenBucketStore(rate=1, capacity=1)
+    assert store.consume("key")
+    assert not store.consume("key")
+
+    store.evict_idle(now=monotonic() + 10)
+    assert store.buckets == {}
+    assert store.consume("key")
+
+
+priority_tmex = TMEXIO(concurrency_limits=ConcurrencyLimits(total=1, max_queued=2))
+served: list[str] = []
+
+
+@priority_tmex.on("history")
+async def fetch_history(name: str) -> str:
+    await release_event.wait()
+    served.append(name)
+    return name
+
+
+@priority_tmex.on("chat", priority=10)
+async def send_chat(name: str) -> str:
+    served.append(name)
+    return name
+
+
+async def test_priority_scheduling() -> None:
+    global release_event  # noqa: WPS420
+    release_event = Event()
+    served.clear()
+    with AsyncSIOTestServer(server=priority_tmex.backend).patch() as server:
+        async with server.connect_client() as client:
+            running = create_task(client.emit("history", {"name": "running"}))
+            await sleep(0)
+            queued = [
+                create_task(client.emit(event_name, {"name": name}))
+                for event_name, name in [
+                    ("history", "first history"),
+                    ("history", "second history"),
+                    ("chat", "chat"),
+                ]
+            ]
+            await sleep(0)
+
+            release_event.set()
+            acks = await gather(running, *queued)
+
+    assert served == ["running", "chat", "first history"]
+    assert_ack(acks[2], expected_code=503, expected_body="Server is overloaded")
@@ -0,0 +1,285 @@
+from collections.abc import AsyncIterator
+from typing import Any
+
+import pytest
+from socketio import packet  # type: ignore[import-untyped]
+from typing_extensions import TypedDict  # pydantic needs it before python 3.12
+
+from tests.utils import AsyncSIOTestClient, AsyncSIOTestServer, assert_ack
+from tmexio import TMEXIO, PayloadLimits, PydanticJSONPacket, PydanticPackager
+from tmexio.packets import RawArguments, RawJSON
+
+PAYLOAD: dict[str, Any] = {"text": "hello", "tags": ["a", "b"], "count": 3, "x": None}
+
+
+@pytest.mark.parametrize(
+    ("packet_type", "data", "packet_id"),
+    [
+        pytest.param(packet.EVENT, ["event", PAYLOAD], None, id="event"),
+        pytest.param(packet.EVENT, ["event", PAYLOAD, "more"], 12, id="event_ack"),
+        pytest.param(packet.ACK, [200, PAYLOAD], 12, id="ack"),
+        pytest.param(packet.CONNECT, {"token": "wow"}, None, id="connect"),
+    ],
+)
+def test_packet_compatibility(
+    packet_type: int, data: Any, packet_id: int | None
+) -> None:
+    default_encoded = packet.Packet(packet_type, data=data, id=packet_id).encode()
+    encoded = PydanticJSONPacket(packet_type, data=data, id=packet_id).encode()
+    assert encoded == default_encoded
+
+    decoded = PydanticJSONPacket(encoded_packet=default_encoded)
+    decoded_data = decoded.data
+    if isinstance(decoded_data, list) and isinstance(decoded_data[-1], RawArguments):
+        decoded_data = [*decoded_data[:-1], *decoded_data[-1].decode()]
+    assert (decoded.packet_type, decoded_data, decoded.id) == (
+        packet_type,
+        data,
+        packet_id,
+    )
+
+
+def test_raw_json_splicing() -> None:
+    packager = PydanticPackager(dict[str, Any], pre_encoded=True)
+    packed = packager.pack_data(PAYLOAD)
+    assert isinstance(packed, tuple)
+    code, body = packed
+    assert isinstance(body, RawJSON)
+
+    encoded = PydanticJSONPacket(packet.ACK, data=[code, body], id=1).encode()
+    assert encoded == packet.Packet(packet.ACK, data=[200, PAYLOAD], id=1).encode()
+
+
+class ItemDict(TypedDict):
+    name: str
+
+
+@pytest.mark.parametrize(
+    ("annotation", "data"),
+    [
+        pytest.param(ItemDict, {"name": "a"}, id="typed_dict"),
+        pytest.param(list[ItemDict], [{"name": "a"}], id="typed_dict_list"),
+    ],
+)
+def test_untrusted_annotation_packing(annotation: Any, data: Any) -> None:
+    assert PydanticPackager(annotation).pack_data(data) == (200, data)
+
+
+tmex = TMEXIO(serializer=PydanticJSONPacket)
+tmex.enable_client_batches()
+
+
+@tmex.on("create-item")
+async def create_item(name: str, tags: list[str]) -> str:
+    return f"{name}: {', '.join(tags)}"
+
+
+@tmex.on("read-nothing")
+async def read_nothing() -> None:
+    pass
+
+
+@tmex.on("read-item")
+async def read_item(name: str) -> ItemDict:
+    return ItemDict(name=name)
+
+
+@pytest.fixture()
+async def raw_client() -> AsyncIterator[AsyncSIOTestClient]:
+    with AsyncSIOTestServer(server=tmex.backend).patch() as server:
+        async with server.connect_client() as client:
+            yield client
+
+
+async def emit_raw(client: AsyncSIOTestClient, event_name: str, *data: Any) -> Any:
+    encoded = packet.Packet(packet.EVENT, data=[event_name, *data]).encode()
+    _, *args = PydanticJSONPacket(encoded_packet=encoded).data
+    return await client.emit(event_name, *args)
+
+
+async def emit_encoded(client: AsyncSIOTestClient, *data: Any) -> Any:
+    return await emit_raw(client, "create-item", *data)
+
+
+@pytest.mark.anyio()
+async def test_raw_body_parsing(raw_client: AsyncSIOTestClient) -> None:
+    assert_ack(
+        await emit_encoded(raw_client, {"name": "hello", "tags": ["a", "b"]}),
+        expected_body="hello: a, b",
+    )
+
+
+@pytest.mark.anyio()
+async def test_typed_dict_ack(raw_client: AsyncSIOTestClient) -> None:
+    assert_ack(
+        await raw_client.emit("read-item", {"name": "a"}), expected_body={"name": "a"}
+    )
+
+
+@pytest.mark.parametrize(
+    ("data", "expected_body"),
+    [
+        pytest.param(
+            ({"name": "hello"},),
+            [{"type": "missing", "loc": ["tags"]}],
+            id="invalid_body",
+        ),
+        pytest.param(
+            ({"name": "hello", "tags": []}, "extra"),
+            "Event expects one argument",
+            id="too_many_arguments",
+        ),
+    ],
+)
+@pytest.mark.anyio()
+async def test_raw_body_parsing_errors(
+    raw_client: AsyncSIOTestClient, data: tuple[Any, ...], expected_body: Any
+) -> None:
+    assert_ack(
+        await emit_encoded(raw_client, *data),
+        expected_code=422,
+        expected_body=expected_body,
+    )
+    assert await emit_encoded(raw_client, *data) == await raw_client.emit(
+        "create-item", *data
+    )
+
+
+@pytest.mark.parametrize(
+    ("frame", "expected_body"),
+    [
+        pytest.param(
+            '2["create-item",{"name":"a"',
+            "Event arguments are not valid JSON",
+            id="with_body",
+        ),
+        pytest.param(
+            '2["read-nothing","a"',
+            "Event arguments are not valid JSON",
+            id="without_body",
+        ),
+        pytest.param('2["create-item",]', None, id="trailing_comma"),
+        pytest.param('2["create-item", ]', None, id="spaced_trailing_comma"),
+        pytest.param(
+            '2["create-item"]', "Event expects one argument", id="no_arguments"
+        ),
+    ],
+)
+@pytest.mark.anyio()
+async def test_malformed_raw_arguments(
+    raw_client: AsyncSIOTestClient, frame: str, expected_body: str | None
+) -> None:
+    if expected_body is None:
+        with pytest.raises(ValueError):
+            PydanticJSONPacket(encoded_packet=frame)
+        return
+
+    event_name, *args = PydanticJSONPacket(encoded_packet=frame).data
+    assert_ack(
+        await raw_client.emit(event_name, *args),
+        expected_code=422,
+        expected_body=expected_body,
+    )
+
+
+@pytest.mark.anyio()
+async def test_empty_raw_arguments(raw_client: AsyncSIOTestClient) -> None:
+    assert_ack(
+        await raw_client.emit("create-item", RawArguments("[]")),
+        expected_code=422,
+        expected_body="Event expects one argument",
+    )
+
+
+@tmex.on("create-compact", validation_detail="compact")
+async def create_compact(name: str) -> str:
+    return name
+
+
+@tmex.on("create-code", validation_detail="code")
+async def create_code(name: str) -> str:
+    return name
+
+
+@pytest.mark.parametrize(
+    ("event_name", "expected_body"),
+    [
+        pytest.param(
+            "create-compact",
+            [{"type": "missing", "loc": ("name",), "msg": "Field required"}],
+            id="compact",
+        ),
+        pytest.param("create-code", None, id="code"),
+    ],
+)
+@pytest.mark.anyio()
+async def test_validation_detail(
+    raw_client: AsyncSIOTestClient, event_name: str, expected_body: Any
+) -> None:
+    assert await emit_raw(raw_client, event_name, {}) == (422, expected_body)
+    assert await raw_client.emit(event_name, {}) == (422, expected_body)
+
+
+@tmex.on(
+    "create-limited",
+    payload_limits=PayloadLimits(max_size=64, max_list_length=3, max_depth=2),
+)
+async def create_limited(name: str, tags: list[Any]) -> str:
+    return name
+
+
+TOO_LARGE = "Event body is too large"
+
+
+@pytest.mark.parametrize(
+    ("body", "expected_code", "expected_body"),
+    [
+        pytest.param({"name": "a", "tags": [1, 2]}, 200, "a", id="valid"),
+        pytest.param({"name": "a" * 64, "tags": []}, 413, TOO_LARGE, id="too_large"),
+        pytest.param(
+            {"name": "a", "tags": [1, 2, 3, 4]}, 413, TOO_LARGE, id="long_list"
+        ),
+        pytest.param(
+            {"name": "a", "tags": [[1]]},
+            422,
+            "Event body is too deeply nested",
+            id="too_deep",
+        ),
+    ],
+)
+@pytest.mark.anyio()
+async def test_payload_limits(
+    raw_client: AsyncSIOTestClient,
+    body: dict[str, Any],
+    expected_code: int,
+    expected_body: Any,
+) -> None:
+    assert await emit_raw(raw_client, "create-limited", body) == (
+        expected_code,
+        expected_body,
+    )
+    # arguments decoded for the shape check are not parsed a second time
+    handler, _ = tmex.event_handlers["create-limited"]
+    assert "raw_arguments_adapter" not in vars(handler)
+
+
+@pytest.mark.anyio()
+async def test_payload_size_limit_in_client_batch(
+    raw_client: AsyncSIOTestClient,
+) -> None:
+    entries = [
+        ["create-limited", {"name": "a", "tags": []}],
+        ["create-limited", {"name": "a" * 64, "tags": []}],
+    ]
+    assert await emit_raw(raw_client, "batch", {"entries": entries}) == (
+        200,
+        [[200, "a"], [413, TOO_LARGE]],
+    )
+
+
+def test_payload_size_limit_requires_raw_json() -> None:
+    with pytest.raises(TypeError):
+
+        @TMEXIO().on("create", payload_limits=PayloadLimits(max_size=64))
+        async def create(name: str) -> None:
+            pass
@@ -0,0 +1,48 @@
+import logging
+
+import pytest
+
+from tests.utils import AsyncSIOTestServer, assert_ack
+from tmexio import TMEXIO, EventException, ExceptionReporter
+from tmexio.exceptions import UndocumentedExceptionWarning
+
+pytestmark = pytest.mark.anyio
+
+forbidden = EventException(403, "Forbidden")
+
+
+def build_app(reporter: ExceptionReporter) -> TMEXIO:
+    tmex = TMEXIO(exception_reporter=reporter)
+
+    @tmex.on("secret")
+    async def get_secret() -> str:
+        raise forbidden
+
+    return tmex
+
+
+async def test_exception_reporting(caplog: pytest.LogCaptureFixture) -> None:
+    reporter = ExceptionReporter()
+    tmex = build_app(reporter)
+
+    with AsyncSIOTestServer(server=tmex.backend).patch() as server:
+        async with server.connect_client() as client:
+            with caplog.at_level(logging.WARNING, logger="tmexio"):
+                for _ in range(3):
+                    assert_ack(
+                        await client.emit("secret"),
+                        expected_code=403,
+                        expected_body="Forbidden",
+                    )
+
+    assert reporter.counters == {("secret", 403): 3}
+    assert len(caplog.records) == 1
+
+
+async def test_strict_exception_reporting() -> None:
+    tmex = build_app(ExceptionReporter(strict=True))
+
+    with AsyncSIOTestServer(server=tmex.backend).patch() as server:
+        async with server.connect_client() as client:
+            with pytest.raises(UndocumentedExceptionWarning):
+                await client.emit("secret")
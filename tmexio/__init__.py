@@ -1,18 +1,40 @@
+from tmexio.batching import EmitBatcher
+from tmexio.caches import DependencyCache
+from tmexio.conflation import ConflatingEmitter, Conflator
+from tmexio.deltas import DeltaEmitter, DeltaTracker
 from tmexio.exceptions import EventException
+from tmexio.limits import ConcurrencyLimits
 from tmexio.main import TMEXIO, EventRouter, register_dependency
 from tmexio.markers import EventName, Sid
 from tmexio.packagers import PydanticPackager
-from tmexio.server import AsyncServer, AsyncSocket, Emitter
+from tmexio.packets import PydanticJSONPacket
+from tmexio.payload_limits import PayloadLimits
+from tmexio.rate_limits import TokenBucketStore, rate_limit
+from tmexio.reporting import ExceptionReporter
+from tmexio.server import AsyncServer, AsyncSocket, Emitter, PreparedEvent
 
 __all__ = [
     "TMEXIO",
     "EventRouter",
     "register_dependency",
+    "rate_limit",
+    "TokenBucketStore",
+    "DependencyCache",
+    "ConcurrencyLimits",
+    "PayloadLimits",
     "EventName",
     "Sid",
     "AsyncServer",
     "AsyncSocket",
     "Emitter",
+    "ConflatingEmitter",
+    "Conflator",
+    "EmitBatcher",
+    "DeltaEmitter",
+    "DeltaTracker",
+    "PreparedEvent",
     "PydanticPackager",
+    "PydanticJSONPacket",
     "EventException",
+    "ExceptionReporter",
 ]
@@ -0,0 +1,85 @@
+from asyncio import Task, create_task, gather, sleep
+from typing import Any
+
+import socketio  # type: ignore[import-untyped]
+
+from tmexio.packets import RawJSON, event_arguments
+
+BatchItem = tuple[str, Any, Any]  # event name, data and the envelope entry
+
+
+class EmitBatcher:
+    def __init__(
+        self,
+        backend: socketio.AsyncServer,
+        interval: float = 0,
+        event_name: str = "batch",
+        supports_raw_json: bool = False,
+    ) -> None:
+        self.backend = backend
+        self.interval = interval
+        self.event_name = event_name
+        self.supports_raw_json = supports_raw_json
+
+        self.pending: dict[tuple[str, str], list[BatchItem]] = {}
+        self.flush_task: Task[None] | None = None
+
+    def build_entry(self, event: str, data: Any) -> Any:
+        entry = [event, *event_arguments(data)]
+        if self.supports_raw_json:  # encoded once, even if sent to many recipients
+            return RawJSON(self.backend.packet_class.json.dumps(entry))
+        return entry
+
+    def add(
+        self,
+        event: str,
+        data: Any,
+        target: str | list[str] | None,
+        skip_sid: str | list[str] | None,
+        namespace: str | None,
+    ) -> None:
+        namespace = namespace or "/"
+        skipped_sids = {skip_sid} if isinstance(skip_sid, str) else set(skip_sid or ())
+
+        item: BatchItem = event, data, self.build_entry(event, data)
+        for sid, _ in self.backend.manager.get_participants(namespace, target):
+            if sid not in skipped_sids:
+                self.pending.setdefault((namespace, sid), []).append(item)
+
+        if self.flush_task is None:
+            self.flush_task = create_task(self.flush_later())
+
+    async def flush_later(self) -> None:
+        await sleep(self.interval)
+        self.flush_task = None
+        await self.emit_pending()
+
+    async def flush(self) -> None:
+        if self.flush_task is not None:
+            self.flush_task.cancel()
+            self.flush_task = None
+        await self.emit_pending()
+
+    async def emit_batch(
+        self, namespace: str, sid: str, items: list[BatchItem]
+    ) -> None:
+        if len(items) == 1:  # lone events are sent as is, without the envelope
+            event, data, _ = items[0]
+        else:
+            event, data = self.event_name, [entry for _, _, entry in items]
+        await self.backend.emit(
+            event=event,
+            data=data,
+            to=sid,
+            namespace=namespace,
+            ignore_queue=True,
+        )
+
+    async def emit_pending(self) -> None:
+        pending, self.pending = self.pending, {}
+        await gather(
+            *(
+                self.emit_batch(namespace, sid, items)
+                for (namespace, sid), items in pending.items()
+            )
+        )
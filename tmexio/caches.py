@@ -0,0 +1,122 @@
+from asyncio import CancelledError, Future, get_running_loop, shield
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Hashable
+from time import monotonic
+from typing import Any
+
+KeyFunction = Callable[..., Hashable]
+
+
+class DependencyCache:
+    def __init__(
+        self,
+        max_size: int = 1024,
+        ttl: float | None = None,
+        key: KeyFunction | None = None,
+    ) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.key_function = key
+
+        self.entries: OrderedDict[Hashable, tuple[float | None, Any]] = OrderedDict()
+        self.pending: dict[Hashable, Future[Any]] = {}
+        self.hits: int = 0
+        self.misses: int = 0
+
+    @property
+    def size(self) -> int:
+        return len(self.entries)
+
+    def build_key(self, kwargs: dict[str, Any]) -> Hashable:
+        if self.key_function is not None:
+            return self.key_function(**kwargs)
+        return tuple(sorted(kwargs.items()))
+
+    def lookup(self, key: Hashable) -> tuple[bool, Any]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return False, None
+
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= monotonic():
+            del self.entries[key]
+            return False, None
+
+        self.entries.move_to_end(key)
+        return True, value
+
+    def store(self, key: Hashable, value: Any) -> None:
+        expires_at = None if self.ttl is None else monotonic() + self.ttl
+        self.entries[key] = expires_at, value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    async def load(
+        self,
+        key: Hashable,
+        async_callable: Callable[..., Awaitable[Any]],
+        kwargs: dict[str, Any],
+    ) -> Any:
+        self.misses += 1
+        future: Future[Any] = get_running_loop().create_future()
+        self.pending[key] = future
+        try:
+            value = await async_callable(**kwargs)
+        except CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # re-raised below, marks the exception as retrieved
+            raise
+        else:
+            future.set_result(value)
+            if self.pending.get(key) is future:  # not invalidated while loading
+                self.store(key, value)
+            return value
+        finally:
+            if self.pending.get(key) is future:
+                del self.pending[key]
+
+    async def resolve(
+        self,
+        async_callable: Callable[..., Awaitable[Any]],
+        kwargs: dict[str, Any],
+    ) -> Any:
+        key = self.build_key(kwargs)
+        try:
+            found, value = self.lookup(key)
+        except TypeError:  # unhashable arguments are never cached
+            self.misses += 1
+            return await async_callable(**kwargs)
+
+        if found:
+            self.hits += 1
+            return value
+
+        pending = self.pending.get(key)
+        if pending is not None:  # the same value is already being loaded
+            try:
+                value = await shield(pending)
+            except CancelledError:
+                if not pending.cancelled():
+                    raise
+            else:
+                self.hits += 1
+                return value
+
+        return await self.load(key, async_callable, kwargs)
+
+    def invalidate(self, **kwargs: Any) -> None:
+        key = self.build_key(kwargs)
+        self.entries.pop(key, None)
+        self.pending.pop(key, None)
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.pending.clear()
+
+    def reset_counters(self) -> None:
+        self.hits = 0
+        self.misses = 0
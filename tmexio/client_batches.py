@@ -0,0 +1,108 @@
+from asyncio import gather
+from collections.abc import Awaitable, Callable
+from inspect import signature
+from typing import Annotated, Any
+
+from pydantic import BeforeValidator, Field
+
+from tmexio.event_handlers import AsyncEventHandler, BaseAsyncHandler
+from tmexio.exceptions import EventException
+from tmexio.limits import ConcurrencyGuard
+from tmexio.packagers import ErrorPackager, PassthroughPackager
+from tmexio.server import AsyncServer
+from tmexio.specs import HandlerSpec
+from tmexio.structures import ClientEvent
+from tmexio.types import DataOrTuple
+
+BatchEntry = tuple[str, Any]  # event name and its body, `null` for no body
+BatchAck = list[Any]  # acks are sent as [code, body] for each entry
+
+
+class BatchDispatcher:
+    error_packager: ErrorPackager = ErrorPackager()
+
+    unknown_event_error = EventException(404, "Unknown event in batch")
+    nested_batch_error = EventException(422, "Batches can not be nested")
+
+    def __init__(
+        self,
+        server: AsyncServer,
+        event_handlers: dict[str, tuple[BaseAsyncHandler, HandlerSpec]],
+        event_name: str,
+        max_entries: int,
+        concurrent: bool = False,
+        concurrency_guard: ConcurrencyGuard | None = None,
+    ) -> None:
+        self.server = server
+        self.event_handlers = event_handlers
+        self.event_name = event_name
+        self.max_entries = max_entries
+        self.concurrent = concurrent
+        self.concurrency_guard = concurrency_guard
+
+        self.too_many_entries_error = EventException(
+            413, f"Batch can not have more than {max_entries} entries"
+        )
+
+    def find_handler(self, event_name: str) -> AsyncEventHandler | None:
+        for handler_name in (event_name, "*"):
+            handler, _ = self.event_handlers.get(handler_name, (None, None))
+            if isinstance(handler, AsyncEventHandler):
+                return handler
+        return None
+
+    async def dispatch_entry(self, event: ClientEvent, entry: BatchEntry) -> BatchAck:
+        event_name, body = entry
+
+        ack: DataOrTuple
+        handler = self.find_handler(event_name)
+        if event_name == self.event_name:
+            ack = self.error_packager.pack_data(self.nested_batch_error)
+        elif handler is None:
+            ack = self.error_packager.pack_data(self.unknown_event_error)
+        elif self.concurrency_guard is not None:
+            ack = await self.concurrency_guard.run(
+                handler, ClientEvent(self.server, event_name, event.sid, body)
+            )
+        else:
+            ack = await handler(ClientEvent(self.server, event_name, event.sid, body))
+
+        if isinstance(ack, tuple):
+            return list(ack)
+        return [] if ack is None else [ack]
+
+    def check_entries_count(self, entries: Any) -> Any:
+        # runs before any entry is validated, so oversized batches are rejected early
+        if isinstance(entries, list) and len(entries) > self.max_entries:
+            raise self.too_many_entries_error
+        return entries
+
+    async def handle_batch(
+        self,
+        entries: list[BatchEntry],
+        event: ClientEvent,
+    ) -> Annotated[list[BatchAck], PassthroughPackager(list[tuple[int, Any]])]:
+        if self.concurrent:
+            return list(
+                await gather(*(self.dispatch_entry(event, entry) for entry in entries))
+            )
+        return [await self.dispatch_entry(event, entry) for entry in entries]
+
+    def build_handler(self) -> Callable[..., Awaitable[list[BatchAck]]]:
+        async def handle_batch(
+            entries: list[BatchEntry], event: ClientEvent
+        ) -> list[BatchAck]:
+            return await self.handle_batch(entries, event)
+
+        handler_signature = signature(self.handle_batch)
+        entries = handler_signature.parameters["entries"].replace(
+            annotation=Annotated[
+                list[BatchEntry],
+                BeforeValidator(self.check_entries_count),
+                Field(max_length=self.max_entries),
+            ]
+        )
+        handle_batch.__signature__ = handler_signature.replace(  # type: ignore[attr-defined]
+            parameters=[entries, handler_signature.parameters["event"]]
+        )
+        return handle_batch
@@ -0,0 +1,139 @@
+from asyncio import Task, create_task, sleep
+from collections.abc import Callable, Hashable
+from typing import Any, TypeVar
+
+from pydantic import TypeAdapter
+
+from tmexio.server import AsyncSocket, Emitter, exclude_sid, freeze_recipients
+from tmexio.types import CallbackProtocol, Recipients
+
+T = TypeVar("T")
+
+ConflationKey = tuple[str, Hashable, Hashable, str | None, Hashable]
+ConflatedEmit = tuple[Emitter[Any], Any, Recipients, Recipients, str | None, bool]
+
+
+class Conflator:
+    def __init__(
+        self,
+        interval: float,
+        key: Callable[[Any], Hashable] | None = None,
+    ) -> None:
+        self.interval = interval
+        # without a key all updates of an event for the same recipients are
+        # conflated into the latest one, a key keeps one update per entity
+        self.key_function = key
+
+        self.pending: dict[ConflationKey, ConflatedEmit] = {}
+        self.flush_task: Task[None] | None = None
+
+    def add(
+        self,
+        emitter: Emitter[Any],
+        data: Any,
+        target: Recipients,
+        skip_sid: Recipients,
+        namespace: str | None,
+        ignore_queue: bool,
+        key: Hashable = None,
+    ) -> None:
+        if key is None and self.key_function is not None:
+            key = self.key_function(data)
+        conflation_key = (
+            emitter.event_name,
+            freeze_recipients(target),
+            freeze_recipients(skip_sid),
+            namespace,
+            key,
+        )
+        # re-inserting moves the entry to the end, so flushes follow update order
+        self.pending.pop(conflation_key, None)
+        self.pending[conflation_key] = (
+            emitter,
+            data,
+            target,
+            skip_sid,
+            namespace,
+            ignore_queue,
+        )
+
+        if self.flush_task is None:
+            self.flush_task = create_task(self.flush_later())
+
+    async def flush_later(self) -> None:
+        await sleep(self.interval)
+        self.flush_task = None
+        await self.emit_pending()
+
+    async def flush(self) -> None:
+        if self.flush_task is not None:
+            self.flush_task.cancel()
+            self.flush_task = None
+        await self.emit_pending()
+
+    async def emit_pending(self) -> None:
+        pending, self.pending = self.pending, {}
+        for (
+            emitter,
+            data,
+            target,
+            skip_sid,
+            namespace,
+            ignore_queue,
+        ) in pending.values():
+            await emitter.socket.server.emit(
+                event=emitter.event_name,
+                data=emitter.serialize_data(data),
+                target=target,
+                skip_sid=skip_sid,
+                namespace=namespace,
+                ignore_queue=ignore_queue,
+            )
+
+
+class ConflatingEmitter(Emitter[T]):
+    __slots__ = ("conflator",)
+
+    def __init__(
+        self,
+        socket: AsyncSocket,
+        event_name: str,
+        adapter: TypeAdapter[Any],
+        conflator: Conflator,
+        trusted_type: type[Any] | None = None,
+    ) -> None:
+        super().__init__(
+            socket=socket,
+            event_name=event_name,
+            adapter=adapter,
+            trusted_type=trusted_type,
+        )
+        self.conflator = conflator
+
+    async def emit(
+        self,
+        data: T,
+        target: Recipients = None,
+        skip_sid: Recipients = None,
+        exclude_self: bool = False,
+        namespace: str | None = None,
+        callback: CallbackProtocol | None = None,
+        ignore_queue: bool = False,
+        key: Hashable = None,
+    ) -> None:
+        if callback is not None:
+            raise TypeError("Conflated emits do not support callbacks")
+        self.conflator.add(
+            emitter=self,
+            data=self.validate_data(data),
+            target=target,
+            skip_sid=(
+                exclude_sid(skip_sid, self.socket.sid) if exclude_self else skip_sid
+            ),
+            namespace=namespace,
+            ignore_queue=ignore_queue,
+            key=key,
+        )
+
+    async def flush(self) -> None:
+        await self.conflator.flush()
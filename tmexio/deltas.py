@@ -0,0 +1,220 @@
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import Any, Literal, TypeVar
+
+from pydantic import BaseModel, TypeAdapter, create_model
+from pydantic_core import to_json
+
+from tmexio.packets import RawJSON
+from tmexio.server import AsyncSocket, Emitter, freeze_recipients
+from tmexio.types import CallbackProtocol, Recipients
+
+T = TypeVar("T")
+
+JSONPatch = list[dict[str, Any]]
+DeltaKey = tuple[str, Hashable, str | None, Hashable]
+
+
+class PatchOperation(BaseModel):
+    op: Literal["add", "remove", "replace"]
+    path: str
+    value: Any = None
+
+
+def escape_pointer(key: str) -> str:
+    return key.replace("~", "~0").replace("/", "~1")
+
+
+def json_diff(previous: Any, current: Any, path: str = "") -> JSONPatch:
+    # RFC 6902 operations between two json-mode values, lists are diffed by index
+    if isinstance(previous, dict) and isinstance(current, dict):
+        patch: JSONPatch = []
+        for key, value in current.items():
+            pointer = f"{path}/{escape_pointer(str(key))}"
+            if key not in previous:
+                patch.append({"op": "add", "path": pointer, "value": value})
+            else:
+                patch.extend(json_diff(previous[key], value, pointer))
+        for key in previous.keys() - current.keys():
+            patch.append({"op": "remove", "path": f"{path}/{escape_pointer(key)}"})
+        return patch
+
+    if (
+        isinstance(previous, list)
+        and isinstance(current, list)
+        and len(previous) == len(current)
+    ):
+        patch = []
+        for index, (old_item, new_item) in enumerate(zip(previous, current)):
+            patch.extend(json_diff(old_item, new_item, f"{path}/{index}"))
+        return patch
+
+    if previous == current and type(previous) is type(current):
+        return []
+    return [{"op": "replace", "path": path, "value": current}]
+
+
+class DeltaTracker:
+    def __init__(
+        self,
+        key: Callable[[Any], Hashable] | None = None,
+        max_states: int = 10000,
+    ) -> None:
+        self.key_function = key
+        self.max_states = max_states
+        # least recently emitted states are dropped first, their next emit is a snapshot
+        self.states: OrderedDict[DeltaKey, Any] = OrderedDict()
+
+    def build_envelope_adapter(
+        self, body_annotation: Any, event_name: str
+    ) -> TypeAdapter[Any]:
+        return TypeAdapter(
+            create_model(
+                f"{event_name}.Delta",
+                key=(Any, None),
+                snapshot=(body_annotation | None, None),
+                patch=(list[PatchOperation] | None, None),
+            )
+        )
+
+    def build_key(
+        self,
+        event_name: str,
+        target: Recipients,
+        namespace: str | None,
+        key: Hashable,
+    ) -> DeltaKey:
+        return event_name, freeze_recipients(target), namespace, key
+
+    def build_data_key(self, data: Any, key: Hashable) -> Hashable:
+        if key is None and self.key_function is not None:
+            return self.key_function(data)
+        return key
+
+    def swap_state(self, delta_key: DeltaKey, state: Any) -> Any:
+        previous = self.states.pop(delta_key, None)
+        self.states[delta_key] = state
+        while len(self.states) > self.max_states:
+            self.states.popitem(last=False)
+        return previous
+
+    def forget(
+        self,
+        event_name: str,
+        target: Recipients,
+        namespace: str | None = None,
+        key: Hashable = None,
+    ) -> None:
+        self.states.pop(self.build_key(event_name, target, namespace, key), None)
+
+    def clear(self) -> None:
+        self.states.clear()
+
+
+class DeltaEmitter(Emitter[T]):
+    __slots__ = ("tracker",)
+
+    def __init__(
+        self,
+        socket: AsyncSocket,
+        event_name: str,
+        adapter: TypeAdapter[Any],
+        tracker: DeltaTracker,
+        trusted_type: type[Any] | None = None,
+    ) -> None:
+        super().__init__(
+            socket=socket,
+            event_name=event_name,
+            adapter=adapter,
+            trusted_type=trusted_type,
+        )
+        self.tracker = tracker
+
+    def serialize_envelope(self, envelope: dict[str, Any]) -> Any:
+        if self.socket.server.supports_raw_json:
+            return RawJSON(to_json(envelope).decode())
+        return envelope
+
+    def build_envelope(self, key: Hashable, previous: Any, state: Any) -> Any:
+        snapshot = {"key": key, "snapshot": state}
+        if previous is None:
+            return self.serialize_envelope(snapshot)
+
+        patch = json_diff(previous, state)
+        if len(patch) == 0:
+            return None
+
+        # the patch is only sent if it is smaller than the full snapshot
+        patch_envelope = {"key": key, "patch": patch}
+        encoded_patch = to_json(patch_envelope)
+        encoded_snapshot = to_json(snapshot)
+        if len(encoded_patch) < len(encoded_snapshot):
+            envelope, encoded = patch_envelope, encoded_patch
+        else:
+            envelope, encoded = snapshot, encoded_snapshot
+
+        if self.socket.server.supports_raw_json:
+            return RawJSON(encoded.decode())
+        return envelope
+
+    async def emit(
+        self,
+        data: T,
+        target: Recipients = None,
+        skip_sid: Recipients = None,
+        exclude_self: bool = False,
+        namespace: str | None = None,
+        callback: CallbackProtocol | None = None,
+        ignore_queue: bool = False,
+        key: Hashable = None,
+    ) -> None:
+        if skip_sid is not None or exclude_self or callback is not None:
+            raise TypeError(
+                "Delta emits go to every member of the target, "
+                "skipping sids or using callbacks is not supported"
+            )
+
+        validated = self.validate_data(data)
+        key = self.tracker.build_data_key(validated, key)
+        state = self.adapter.dump_python(validated, mode="json")
+        previous = self.tracker.swap_state(
+            self.tracker.build_key(self.event_name, target, namespace, key), state
+        )
+
+        envelope = self.build_envelope(key, previous, state)
+        if envelope is None:
+            return
+        await self.socket.server.emit(
+            event=self.event_name,
+            data=envelope,
+            target=target,
+            namespace=namespace,
+            ignore_queue=ignore_queue,
+        )
+
+    def forget(
+        self, target: Recipients, namespace: str | None = None, key: Hashable = None
+    ) -> None:
+        self.tracker.forget(self.event_name, target, namespace, key)
+
+    async def emit_snapshot(
+        self,
+        sid: str,
+        target: Recipients = None,
+        namespace: str | None = None,
+        key: Hashable = None,
+        ignore_queue: bool = False,
+    ) -> None:
+        # should be called when a client joins the target, so patches apply
+        state = self.tracker.states.get(
+            self.tracker.build_key(self.event_name, target, namespace, key)
+        )
+        if state is None:
+            return
+        await self.socket.server.emit(
+            event=self.event_name,
+            data=self.serialize_envelope({"key": key, "snapshot": state}),
+            target=sid,
+            namespace=namespace,
+            ignore_queue=ignore_queue,
+        )
@@ -1,37 +1,38 @@
 from __future__ import annotations
 
-from collections.abc import Awaitable, Callable, Iterator
+from asyncio import gather, timeout
+from collections.abc import Awaitable, Callable, Mapping
 from contextlib import AbstractAsyncContextManager, AsyncExitStack
-from dataclasses import dataclass, field
-from typing import Any
-from warnings import warn
+from functools import cached_property
+from types import MappingProxyType
+from typing import Any, TypeVar
 
-from pydantic import BaseModel, ValidationError
+from pydantic import BaseModel, ConfigDict, TypeAdapter, ValidationError
 from socketio.exceptions import ConnectionRefusedError  # type: ignore[import-untyped]
 
-from tmexio.exceptions import (
-    EventBodyException,
-    EventException,
-    UndocumentedExceptionWarning,
-)
+from tmexio.caches import DependencyCache
+from tmexio.exceptions import EventBodyException, EventException
 from tmexio.markers import Marker
 from tmexio.packagers import CodedPackager, ErrorPackager
+from tmexio.packets import RawArguments
+from tmexio.payload_limits import PayloadLimits
+from tmexio.server import ConnectionScope
 from tmexio.structures import ClientEvent
-from tmexio.types import DataOrTuple, DependencyCacheKey
+from tmexio.types import DataOrTuple, DataType, DependencyCacheKey, ValidationDetail
 
 ExtractedMarkers = dict[Marker[Any], Any]
 ParsedBody = BaseModel | None
 ResolvedDependencies = dict[DependencyCacheKey, Any]
-KwargsIterator = Iterator[tuple[str, Any]]
 Kwargs = dict[str, Any]
 
+DetachedResult = tuple[Any, AbstractAsyncContextManager[Any] | None]
 
-@dataclass()
-class HandlerContext:
-    stack: AsyncExitStack
-    extracted_markers: ExtractedMarkers
-    parsed_body: ParsedBody
-    resolved_dependencies: ResolvedDependencies = field(default_factory=dict)
+NO_DEPENDENCIES: Mapping[DependencyCacheKey, Any] = MappingProxyType({})
+
+Runner = Callable[[ExtractedMarkers, ParsedBody], Awaitable[Any]]
+
+PlanSource = TypeVar("PlanSource")
+KwargsPlan = tuple[tuple[str, PlanSource], ...]
 
 
 class KwargsBuilder:
@@ -45,38 +46,69 @@ class KwargsBuilder:
         self.body_destinations = body_destinations
         self.dependency_destinations = dependency_destinations
 
-    def markers_to_kwargs(self, extracted_markers: ExtractedMarkers) -> KwargsIterator:
-        for marker, parameter_names in self.marker_destinations:
-            yield from ((name, extracted_markers[marker]) for name in parameter_names)
+        # flat (parameter_name, source) plans, compiled once on build
+        self.marker_plan: KwargsPlan[Marker[Any]] = self.compile_plan(
+            marker_destinations
+        )
+        self.body_plan: KwargsPlan[str] = self.compile_plan(body_destinations)
+        self.dependency_plan: KwargsPlan[DependencyCacheKey] = self.compile_plan(
+            dependency_destinations
+        )
 
-    def body_to_kwargs(self, parsed_body: BaseModel) -> KwargsIterator:
-        for field_name, parameter_names in self.body_destinations:
-            # TODO replace fallback with error or warning
-            value = getattr(parsed_body, field_name, None)
-            yield from ((name, value) for name in parameter_names)
+    @staticmethod
+    def compile_plan(
+        destinations: list[tuple[PlanSource, list[str]]]
+    ) -> KwargsPlan[PlanSource]:
+        return tuple(
+            (parameter_name, source)
+            for source, parameter_names in destinations
+            for parameter_name in parameter_names
+        )
 
-    def dependencies_to_kwargs(
-        self, resolved_dependencies: ResolvedDependencies
-    ) -> KwargsIterator:
-        for dependency_key, parameter_names in self.dependency_destinations:
+    def build_kwargs(
+        self,
+        extracted_markers: ExtractedMarkers,
+        parsed_body: ParsedBody,
+        resolved_dependencies: Mapping[DependencyCacheKey, Any],
+    ) -> Kwargs:
+        kwargs: Kwargs = {
+            name: extracted_markers[marker] for name, marker in self.marker_plan
+        }
+
+        if parsed_body is not None:
+            for name, field_name in self.body_plan:
+                # TODO replace fallback with error or warning
+                kwargs[name] = getattr(parsed_body, field_name, None)
+
+        for name, dependency_key in self.dependency_plan:
             # TODO replace fallback with error or warning
-            value = resolved_dependencies.get(dependency_key)
-            yield from ((name, value) for name in parameter_names)
+            kwargs[name] = resolved_dependencies.get(dependency_key)
 
-    def iterate_kwargs(self, context: HandlerContext) -> KwargsIterator:
-        yield from self.markers_to_kwargs(context.extracted_markers)
-        if context.parsed_body is not None:
-            yield from self.body_to_kwargs(context.parsed_body)
-        yield from self.dependencies_to_kwargs(context.resolved_dependencies)
-
-    def build_kwargs(self, context: HandlerContext) -> Kwargs:
-        return dict(self.iterate_kwargs(context))
+        return kwargs
 
 
 class BaseDependency(KwargsBuilder):
-    async def __call__(self, context: HandlerContext) -> Any:
+    async def __call__(
+        self,
+        extracted_markers: ExtractedMarkers,
+        parsed_body: ParsedBody,
+        resolved_dependencies: ResolvedDependencies,
+        stack: AsyncExitStack | None,
+    ) -> Any:
         raise NotImplementedError
 
+    async def resolve_detached(
+        self,
+        extracted_markers: ExtractedMarkers,
+        parsed_body: ParsedBody,
+        resolved_dependencies: ResolvedDependencies,
+    ) -> DetachedResult:
+        value = await self(extracted_markers, parsed_body, resolved_dependencies, None)
+        return value, None
+
+
+DependencyLayer = list[tuple[DependencyCacheKey, BaseDependency]]
+
 
 class ValueDependency(BaseDependency):
     def __init__(
@@ -85,6 +117,7 @@ class ValueDependency(BaseDependency):
         marker_destinations: list[tuple[Marker[Any], list[str]]],
         body_destinations: list[tuple[str, list[str]]],
         dependency_destinations: list[tuple[DependencyCacheKey, list[str]]],
+        cache: DependencyCache | None = None,
     ) -> None:
         super().__init__(
             marker_destinations=marker_destinations,
@@ -92,10 +125,21 @@ class ValueDependency(BaseDependency):
             dependency_destinations=dependency_destinations,
         )
         self.async_callable = async_callable
+        self.cache = cache
 
-    async def __call__(self, context: HandlerContext) -> Any:
-        kwargs: Kwargs = self.build_kwargs(context)
-        return await self.async_callable(**kwargs)
+    async def __call__(
+        self,
+        extracted_markers: ExtractedMarkers,
+        parsed_body: ParsedBody,
+        resolved_dependencies: ResolvedDependencies,
+        stack: AsyncExitStack | None,
+    ) -> Any:
+        kwargs: Kwargs = self.build_kwargs(
+            extracted_markers, parsed_body, resolved_dependencies
+        )
+        if self.cache is None:
+            return await self.async_callable(**kwargs)
+        return await self.cache.resolve(self.async_callable, kwargs)
 
 
 class ContextualDependency(BaseDependency):
@@ -113,10 +157,32 @@ class ContextualDependency(BaseDependency):
         )
         self.dependency_function = dependency_function
 
-    async def __call__(self, context: HandlerContext) -> Any:
-        kwargs: Kwargs = self.build_kwargs(context)
+    async def __call__(
+        self,
+        extracted_markers: ExtractedMarkers,
+        parsed_body: ParsedBody,
+        resolved_dependencies: ResolvedDependencies,
+        stack: AsyncExitStack | None,
+    ) -> Any:
+        if stack is None:
+            raise RuntimeError("Contextual dependencies require an exit stack")
+        kwargs: Kwargs = self.build_kwargs(
+            extracted_markers, parsed_body, resolved_dependencies
+        )
+        cm: AbstractAsyncContextManager[Any] = self.dependency_function(**kwargs)
+        return await stack.enter_async_context(cm)
+
+    async def resolve_detached(
+        self,
+        extracted_markers: ExtractedMarkers,
+        parsed_body: ParsedBody,
+        resolved_dependencies: ResolvedDependencies,
+    ) -> DetachedResult:
+        kwargs: Kwargs = self.build_kwargs(
+            extracted_markers, parsed_body, resolved_dependencies
+        )
         cm: AbstractAsyncContextManager[Any] = self.dependency_function(**kwargs)
-        return await context.stack.enter_async_context(cm)
+        return await cm.__aenter__(), cm
 
 
 class BaseAsyncHandler(KwargsBuilder):
@@ -124,6 +190,13 @@ class BaseAsyncHandler(KwargsBuilder):
 
     zero_arguments_expected_error = EventException(422, "Event expects zero arguments")
     one_argument_expected_error = EventException(422, "Event expects one argument")
+    invalid_body_error = EventException(422, None)
+    malformed_arguments_error = EventException(
+        422, "Event arguments are not valid JSON"
+    )
+
+    validation_detail: ValidationDetail = "full"
+    payload_limits: PayloadLimits | None = None
 
     def __init__(
         self,
@@ -132,9 +205,10 @@ class BaseAsyncHandler(KwargsBuilder):
         marker_destinations: list[tuple[Marker[Any], list[str]]],
         body_model: type[BaseModel] | None,
         body_destinations: list[tuple[str, list[str]]],
-        dependency_definitions: list[tuple[DependencyCacheKey, BaseDependency]],
+        dependency_layers: list[DependencyLayer],
         dependency_destinations: list[tuple[DependencyCacheKey, list[str]]],
         possible_exceptions: set[EventException],
+        concurrent_dependencies: bool = False,
     ) -> None:
         super().__init__(
             marker_destinations=marker_destinations,
@@ -144,40 +218,178 @@ class BaseAsyncHandler(KwargsBuilder):
         self.async_callable = async_callable
         self.markers_definitions = marker_definitions
         self.body_model = body_model
-        self.dependency_definitions = dependency_definitions
+        self.dependency_layers = dependency_layers
+        self.dependency_definitions = [
+            definition for layer in dependency_layers for definition in layer
+        ]
         self.possible_exceptions = possible_exceptions
+        self.concurrent_dependencies = concurrent_dependencies
+
+        self.run: Runner = self.select_runner()
+
+    def select_runner(self) -> Runner:
+        if len(self.dependency_definitions) == 0:
+            return self.run_without_dependencies
+        if any(
+            isinstance(dependency, ContextualDependency)
+            for _, dependency in self.dependency_definitions
+        ):
+            return self.run_with_exit_stack
+        return self.run_without_exit_stack
 
     def collect_markers(self, event: ClientEvent) -> ExtractedMarkers:
         return {marker: marker.extract(event) for marker in self.markers_definitions}
 
+    @cached_property
+    def raw_arguments_adapter(self) -> TypeAdapter[tuple[BaseModel]]:
+        return TypeAdapter(
+            tuple[self.body_model],  # type: ignore[name-defined]
+            config=ConfigDict(cache_strings=False),
+        )
+
+    def decode_arguments(self, event: ClientEvent) -> tuple[DataType, ...]:
+        try:
+            return event.args
+        except ValueError:  # raw arguments are only decoded when needed
+            raise self.malformed_arguments_error
+
+    def parse_raw_body(self, raw_args: RawArguments) -> ParsedBody:
+        try:
+            (body,) = self.raw_arguments_adapter.validate_json(raw_args.encoded)
+        except ValidationError as e:
+            # "code" only needs the structural checks, so inputs are never rendered
+            errors = EventBodyException.render_errors(e, self.validation_detail)
+            if any(error["type"] == "json_invalid" for error in errors):
+                raise self.malformed_arguments_error
+            if any(
+                len(error["loc"]) == 0
+                or (error["type"] == "missing" and error["loc"] == (0,))
+                for error in errors
+            ):
+                raise self.one_argument_expected_error
+            if self.validation_detail == "code":
+                raise self.invalid_body_error
+            # errors are reported as if the body was decoded, without the tuple index
+            raise EventBodyException(
+                e, self.validation_detail, loc_offset=1, errors=errors
+            )
+        return body
+
     def parse_body(self, event: ClientEvent) -> ParsedBody:
         if self.body_model is None:
-            if len(event.args) != 0 and event.args[0] is not None:
+            args = self.decode_arguments(event)
+            if len(args) != 0 and args[0] is not None:
                 raise self.zero_arguments_expected_error
             return None
         else:
-            if len(event.args) != 1:
+            limits = self.payload_limits
+            if limits is not None and event.raw_args is not None:
+                limits.check_size(event.raw_args)
+            elif limits is not None:
+                limits.check_decoded_size(event.args)
+            if limits is not None and limits.checks_shape:
+                # arguments are decoded for the shape check, so they are not parsed again
+                args = self.decode_arguments(event)
+                limits.check_shape(args)
+            elif event.raw_args is not None:
+                return self.parse_raw_body(event.raw_args)
+            else:
+                args = event.args
+
+            if len(args) != 1:
                 raise self.one_argument_expected_error
 
             try:
-                return self.body_model.model_validate(event.args[0])
+                return self.body_model.model_validate(args[0])
             except ValidationError as e:
-                raise EventBodyException(e)
+                if self.validation_detail == "code":
+                    raise self.invalid_body_error
+                raise EventBodyException(e, self.validation_detail)
+
+    async def resolve_dependency_layer(
+        self,
+        layer: DependencyLayer,
+        extracted_markers: ExtractedMarkers,
+        parsed_body: ParsedBody,
+        resolved_dependencies: ResolvedDependencies,
+        stack: AsyncExitStack | None,
+    ) -> None:
+        # context managers are pushed onto the stack in layer order,
+        # so cleanup order does not depend on which dependency finished first
+        exits: list[AbstractAsyncContextManager[Any] | None] = [None] * len(layer)
 
-    async def resolve_dependencies(self, context: HandlerContext) -> None:
-        for dependency_key, dependency in self.dependency_definitions:
-            context.resolved_dependencies[dependency_key] = await dependency(context)
+        async def resolve_one(index: int, dependency: BaseDependency) -> Any:
+            value, exits[index] = await dependency.resolve_detached(
+                extracted_markers, parsed_body, resolved_dependencies
+            )
+            return value
 
-    async def run(self, markers: ExtractedMarkers, body: ParsedBody) -> Any:
-        async with AsyncExitStack() as stack:
-            handler_context = HandlerContext(
-                stack=stack,
-                extracted_markers=markers,
-                parsed_body=body,
+        try:
+            results = await gather(
+                *(
+                    resolve_one(index, dependency)
+                    for index, (_, dependency) in enumerate(layer)
+                ),
+                return_exceptions=True,
             )
-            await self.resolve_dependencies(handler_context)
+        finally:
+            for cm in exits:
+                if cm is not None and stack is not None:
+                    stack.push_async_exit(cm)
+
+        for (dependency_key, _), result in zip(layer, results):
+            if isinstance(result, BaseException):
+                raise result
+            resolved_dependencies[dependency_key] = result
+
+    async def resolve_dependencies(
+        self,
+        extracted_markers: ExtractedMarkers,
+        parsed_body: ParsedBody,
+        resolved_dependencies: ResolvedDependencies,
+        stack: AsyncExitStack | None,
+    ) -> None:
+        if not self.concurrent_dependencies:
+            for dependency_key, dependency in self.dependency_definitions:
+                resolved_dependencies[dependency_key] = await dependency(
+                    extracted_markers, parsed_body, resolved_dependencies, stack
+                )
+            return
+
+        for layer in self.dependency_layers:
+            if len(layer) == 1:
+                dependency_key, dependency = layer[0]
+                resolved_dependencies[dependency_key] = await dependency(
+                    extracted_markers, parsed_body, resolved_dependencies, stack
+                )
+            else:
+                await self.resolve_dependency_layer(
+                    layer, extracted_markers, parsed_body, resolved_dependencies, stack
+                )
+
+    async def run_without_dependencies(
+        self, markers: ExtractedMarkers, body: ParsedBody
+    ) -> Any:
+        kwargs: Kwargs = self.build_kwargs(markers, body, NO_DEPENDENCIES)
+        return await self.async_callable(**kwargs)
 
-            kwargs: Kwargs = self.build_kwargs(handler_context)
+    async def run_without_exit_stack(
+        self, markers: ExtractedMarkers, body: ParsedBody
+    ) -> Any:
+        resolved_dependencies: ResolvedDependencies = {}
+        await self.resolve_dependencies(markers, body, resolved_dependencies, None)
+
+        kwargs: Kwargs = self.build_kwargs(markers, body, resolved_dependencies)
+        return await self.async_callable(**kwargs)
+
+    async def run_with_exit_stack(
+        self, markers: ExtractedMarkers, body: ParsedBody
+    ) -> Any:
+        async with AsyncExitStack() as stack:
+            resolved_dependencies: ResolvedDependencies = {}
+            await self.resolve_dependencies(markers, body, resolved_dependencies, stack)
+
+            kwargs: Kwargs = self.build_kwargs(markers, body, resolved_dependencies)
             return await self.async_callable(**kwargs)
 
     async def __call__(self, event: ClientEvent) -> DataOrTuple:
@@ -185,6 +397,8 @@ class BaseAsyncHandler(KwargsBuilder):
 
 
 class AsyncEventHandler(BaseAsyncHandler):
+    timeout_error = EventException(504, "Event handler timed out")
+
     def __init__(
         self,
         async_callable: Callable[..., Awaitable[Any]],
@@ -192,10 +406,15 @@ class AsyncEventHandler(BaseAsyncHandler):
         marker_destinations: list[tuple[Marker[Any], list[str]]],
         body_model: type[BaseModel] | None,
         body_destinations: list[tuple[str, list[str]]],
-        dependency_definitions: list[tuple[DependencyCacheKey, BaseDependency]],
+        dependency_layers: list[DependencyLayer],
         dependency_destinations: list[tuple[DependencyCacheKey, list[str]]],
         possible_exceptions: set[EventException],
         ack_packager: CodedPackager[Any],
+        concurrent_dependencies: bool = False,
+        timeout: float | None = None,
+        priority: int = 0,
+        validation_detail: ValidationDetail = "full",
+        payload_limits: PayloadLimits | None = None,
     ) -> None:
         super().__init__(
             async_callable=async_callable,
@@ -203,11 +422,36 @@ class AsyncEventHandler(BaseAsyncHandler):
             marker_destinations=marker_destinations,
             body_model=body_model,
             body_destinations=body_destinations,
-            dependency_definitions=dependency_definitions,
+            dependency_layers=dependency_layers,
             dependency_destinations=dependency_destinations,
             possible_exceptions=possible_exceptions,
+            concurrent_dependencies=concurrent_dependencies,
         )
         self.ack_packager = ack_packager
+        self.timeout = timeout
+        self.priority = priority
+        self.validation_detail = validation_detail
+        self.payload_limits = payload_limits
+        if timeout is not None:
+            self.possible_exceptions = {*self.possible_exceptions, self.timeout_error}
+        if payload_limits is not None and body_model is not None:
+            self.possible_exceptions = {
+                *self.possible_exceptions,
+                *payload_limits.build_exceptions(),
+            }
+
+    async def run_with_timeout(
+        self, markers: ExtractedMarkers, body: ParsedBody, delay: float
+    ) -> Any:
+        # cancellation also unwinds contextual dependencies of the handler
+        timeout_manager = timeout(delay)
+        try:
+            async with timeout_manager:
+                return await self.run(markers, body)
+        except TimeoutError:
+            if timeout_manager.expired():
+                raise self.timeout_error
+            raise
 
     async def __call__(self, event: ClientEvent) -> DataOrTuple:
         try:
@@ -217,10 +461,13 @@ class AsyncEventHandler(BaseAsyncHandler):
         markers: ExtractedMarkers = self.collect_markers(event)
 
         try:
-            result = await self.run(markers=markers, body=body)
+            if self.timeout is None:
+                result = await self.run(markers, body)
+            else:
+                result = await self.run_with_timeout(markers, body, self.timeout)
         except EventException as e:
             if e not in self.possible_exceptions:
-                warn(UndocumentedExceptionWarning(e))
+                event.server.exception_reporter.report(event.event_name, e)
             return self.error_packager.pack_data(e)
 
         # TODO error handling on ack packing for clarity
@@ -238,11 +485,44 @@ class AsyncConnectHandler(BaseAsyncHandler):
         markers: ExtractedMarkers = self.collect_markers(event)
 
         try:
-            await self.run(markers=markers, body=body)
+            await self.run(markers, body)
+        except EventException as e:
+            if e not in self.possible_exceptions:
+                event.server.exception_reporter.report(event.event_name, e)
+            raise ConnectionRefusedError(self.error_packager.pack_data(e))
+
+        return None
+
+
+class AsyncConnectionScopeHandler(BaseAsyncHandler):
+    def parse_body(self, event: ClientEvent) -> ParsedBody:
+        if self.body_model is None:
+            return None  # auth data can still be used by the connection handler
+        return super().parse_body(event)
+
+    async def __call__(self, event: ClientEvent) -> DataOrTuple:
+        try:
+            body = self.parse_body(event)
+        except EventException as e:
+            raise ConnectionRefusedError(self.error_packager.pack_data(e))
+        markers: ExtractedMarkers = self.collect_markers(event)
+
+        # Values are kept on the server until `AsyncServer.close_connection_scope`
+        connection_scope = ConnectionScope()
+        event.server.connection_scopes[event.sid] = connection_scope
+
+        try:
+            await self.resolve_dependencies(
+                markers, body, connection_scope.values, connection_scope.stack
+            )
         except EventException as e:
+            await event.server.close_connection_scope(event.sid)
             if e not in self.possible_exceptions:
-                warn(UndocumentedExceptionWarning(e))
+                event.server.exception_reporter.report(event.event_name, e)
             raise ConnectionRefusedError(self.error_packager.pack_data(e))
+        except BaseException:
+            await event.server.close_connection_scope(event.sid)
+            raise
 
         return None
 
@@ -253,8 +533,9 @@ class AsyncDisconnectHandler(BaseAsyncHandler):
         async_callable: Callable[..., Awaitable[Any]],
         marker_definitions: list[Marker[Any]],
         marker_destinations: list[tuple[Marker[Any], list[str]]],
-        dependency_definitions: list[tuple[DependencyCacheKey, BaseDependency]],
+        dependency_layers: list[DependencyLayer],
         dependency_destinations: list[tuple[DependencyCacheKey, list[str]]],
+        concurrent_dependencies: bool = False,
     ) -> None:
         super().__init__(
             async_callable=async_callable,
@@ -262,13 +543,14 @@ class AsyncDisconnectHandler(BaseAsyncHandler):
             marker_destinations=marker_destinations,
             body_model=None,
             body_destinations=[],
-            dependency_definitions=dependency_definitions,
+            dependency_layers=dependency_layers,
             dependency_destinations=dependency_destinations,
             possible_exceptions=set(),
+            concurrent_dependencies=concurrent_dependencies,
         )
 
     async def __call__(self, event: ClientEvent) -> DataOrTuple:
         # Here `event.args` is always empty
         markers: ExtractedMarkers = self.collect_markers(event)
-        await self.run(markers=markers, body=None)
+        await self.run(markers, None)
         return None
@@ -3,19 +3,44 @@ from __future__ import annotations
 from typing import cast
 
 from pydantic import ValidationError
+from pydantic_core import ErrorDetails
 
-from tmexio.types import DataType
+from tmexio.types import DataType, ValidationDetail
 
 
 class EventException(Exception):
     def __init__(self, code: int, ack_body: DataType) -> None:
         self.code = code
         self.ack_body = ack_body
+        self.packed: tuple[int, DataType] = code, ack_body
 
 
 class EventBodyException(EventException):
-    def __init__(self, validation_error: ValidationError) -> None:
-        super().__init__(code=422, ack_body=cast(DataType, validation_error.errors()))
+    def __init__(
+        self,
+        validation_error: ValidationError,
+        detail: ValidationDetail = "full",
+        loc_offset: int = 0,  # leading `loc` items that are not part of the body
+        errors: list[ErrorDetails] | None = None,  # already rendered for `detail`
+    ) -> None:
+        if errors is None:
+            errors = self.render_errors(validation_error, detail)
+        if loc_offset != 0:
+            for error in errors:
+                error["loc"] = error["loc"][loc_offset:]
+        super().__init__(code=422, ack_body=cast(DataType, errors))
+
+    @staticmethod
+    def render_errors(
+        validation_error: ValidationError, detail: ValidationDetail
+    ) -> list[ErrorDetails]:
+        if detail == "full":
+            return validation_error.errors()
+        return validation_error.errors(
+            include_url=False,
+            include_context=False,
+            include_input=False,
+        )
 
 
 class UndocumentedExceptionWarning(RuntimeWarning):
@@ -16,22 +16,29 @@ from typing import Annotated, Any, Generic, TypeVar, get_args, get_origin
 
 from asgiref.sync import sync_to_async
 from pydantic import BaseModel, TypeAdapter, create_model
+from pydantic.fields import FieldInfo
 
 from tmexio import markers, packagers
+from tmexio.caches import DependencyCache
+from tmexio.conflation import Conflator
+from tmexio.deltas import DeltaTracker
 from tmexio.event_handlers import (
     AsyncConnectHandler,
+    AsyncConnectionScopeHandler,
     AsyncDisconnectHandler,
     AsyncEventHandler,
     BaseAsyncHandler,
     BaseDependency,
     ContextualDependency,
+    DependencyLayer,
     ValueDependency,
 )
 from tmexio.exceptions import EventException
+from tmexio.payload_limits import PayloadLimits
 from tmexio.server import AsyncServer, AsyncSocket, Emitter
 from tmexio.specs import AckSpec, HandlerSpec
 from tmexio.structures import ClientEvent
-from tmexio.types import DependencyCacheKey
+from tmexio.types import DependencyCacheKey, DependencyScope, ValidationDetail
 
 
 class Depends:
@@ -40,10 +47,16 @@ class Depends:
         function: DependencyCacheKey,
         exceptions: list[EventException],
         dependencies: list[Depends],
+        scope: DependencyScope = "event",
+        cache: DependencyCache | None = None,
     ) -> None:
         self.function = function
         self.exceptions = exceptions
         self.dependencies = dependencies
+        self.scope = scope
+        self.cache = cache
+        # compiled once per kind of scope, then merged into every handler using it
+        self.compiled: dict[bool, BuilderContext] = {}
 
 
 @dataclass()
@@ -59,6 +72,23 @@ class BuilderContext:
     )
     possible_exceptions: set[EventException] = field(default_factory=set)
     duplex_emitter_model: TypeAdapter[Any] | type[BaseModel] | None = None
+    connection_dependencies: dict[DependencyCacheKey, Depends] = field(
+        default_factory=dict
+    )
+    is_connection_scope: bool = False
+
+    def merge(self, other: BuilderContext) -> None:
+        self.marker_definitions.update(other.marker_definitions)
+        self.body_annotations.update(other.body_annotations)
+        self.dependency_definitions.update(other.dependency_definitions)
+        self.dependency_graph.update(other.dependency_graph)
+        self.possible_exceptions.update(other.possible_exceptions)
+        self.connection_dependencies.update(other.connection_dependencies)
+        if other.duplex_emitter_model is not None:
+            self.duplex_emitter_model = other.duplex_emitter_model
+
+    def is_deferred_to_connection(self, depends: Depends) -> bool:
+        return depends.scope == "connection" and not self.is_connection_scope
 
     def build_marker_definitions(self) -> list[markers.Marker[Any]]:
         return list(self.marker_definitions)
@@ -71,7 +101,7 @@ class BuilderContext:
             **self.body_annotations,
         )
 
-    def iter_ordered_dependency_keys(self) -> Iterator[DependencyCacheKey]:
+    def iter_dependency_layers(self) -> Iterator[list[DependencyCacheKey]]:
         unresolved: dict[DependencyCacheKey, set[DependencyCacheKey]] = {
             key: set(sub_dependencies)
             for key, sub_dependencies in self.dependency_graph.items()
@@ -84,18 +114,20 @@ class BuilderContext:
             ]
             if len(layer) == 0:
                 raise RecursionError("Cycle detected in the dependency graph")
-            yield from layer
+            yield layer
             for resolved in layer:
                 unresolved.pop(resolved)
                 for sub_dependencies in unresolved.values():
                     sub_dependencies.discard(resolved)
 
-    def build_dependency_definitions(
-        self,
-    ) -> list[tuple[DependencyCacheKey, BaseDependency]]:
+    def iter_ordered_dependency_keys(self) -> Iterator[DependencyCacheKey]:
+        for layer in self.iter_dependency_layers():
+            yield from layer
+
+    def build_dependency_layers(self) -> list[DependencyLayer]:
         return [
-            (key, self.dependency_definitions[key])
-            for key in self.iter_ordered_dependency_keys()
+            [(key, self.dependency_definitions[key]) for key in layer]
+            for layer in self.iter_dependency_layers()
         ]
 
 
@@ -147,46 +179,74 @@ class RunnableBuilder:
         self.context.marker_definitions.add(marker)
         self.marker_destinations.add(marker, field_name)
 
-    def add_duplex_emitter(self, body_annotation: Any, field_name: str) -> None:
+    def add_duplex_emitter(
+        self,
+        body_annotation: Any,
+        field_name: str,
+        conflator: Conflator | None = None,
+        delta_tracker: DeltaTracker | None = None,
+    ) -> None:
         marker: markers.ServerEmitterMarker[Any] = markers.ServerEmitterMarker(
             body_annotation=body_annotation,
             event_name=self.context.event_name,
+            conflator=conflator,
+            delta_tracker=delta_tracker,
         )
-        self.context.duplex_emitter_model = marker.adapter
+        self.context.duplex_emitter_model = marker.body_model
         self.add_marker_destination(marker=marker, field_name=field_name)
 
     def add_body_field(self, field_name: str, parameter_annotation: Any) -> None:
-        if get_origin(parameter_annotation) is not Annotated:
+        args = get_args(parameter_annotation)
+        if not (
+            get_origin(parameter_annotation) is Annotated
+            and len(args) == 2
+            and isinstance(args[1], FieldInfo)
+        ):  # `create_model` would drop metadata other than a single FieldInfo
             parameter_annotation = parameter_annotation, ...
         # TODO this should check for conflicts (on context level)
         self.context.body_annotations[field_name] = parameter_annotation
         self.body_destinations.add(field_name, field_name)
 
-    def build_sub_dependency(self, depends: Depends) -> None:
-        # TODO reuse built dependencies from building other handlers
-        self.context.dependency_definitions[depends.function] = DependencyBuilder(
+    def compile_sub_dependency(self, depends: Depends) -> BuilderContext:
+        compiled = depends.compiled.get(self.context.is_connection_scope)
+        if compiled is not None:
+            return compiled
+
+        compiled = BuilderContext(
+            event_name=self.context.event_name,
+            is_connection_scope=self.context.is_connection_scope,
+        )
+        dependency = DependencyBuilder(
             function=depends.function,
             possible_exceptions=depends.exceptions,
             sub_dependencies=depends.dependencies,
-            builder_context=self.context,
+            builder_context=compiled,
+            cache=depends.cache,
         ).build()
+        sub_dependencies = {key for key, _ in dependency.dependency_destinations}
+
+        compiled.dependency_definitions[depends.function] = dependency
+        compiled.dependency_graph[depends.function] = sub_dependencies
+        if compiled.duplex_emitter_model is None:  # emitters are bound to the event
+            depends.compiled[self.context.is_connection_scope] = compiled
+        return compiled
 
     def add_sub_dependency(self, depends: Depends) -> None:
-        if depends.function in self.context.dependency_graph:
+        if self.context.is_deferred_to_connection(depends):
+            self.context.connection_dependencies[depends.function] = depends
             return
 
-        dependency = DependencyBuilder(
-            function=depends.function,
-            possible_exceptions=depends.exceptions,
-            sub_dependencies=depends.dependencies,
-            builder_context=self.context,
-        ).build()
-        sub_dependencies = {key for key, _ in dependency.dependency_destinations}
+        if depends.function in self.context.dependency_graph:
+            return
 
-        self.context.dependency_definitions[depends.function] = dependency
-        self.context.dependency_graph[depends.function] = sub_dependencies
+        self.context.merge(self.compile_sub_dependency(depends))
 
     def add_dependency_destination(self, depends: Depends, field_name: str) -> None:
+        if self.context.is_deferred_to_connection(depends):
+            self.context.connection_dependencies[depends.function] = depends
+            marker = markers.ConnectionDependencyMarker(depends.function)
+            return self.add_marker_destination(marker, field_name)
+
         self.add_sub_dependency(depends)
         self.dependency_destinations.add(depends.function, field_name)
 
@@ -207,6 +267,18 @@ class RunnableBuilder:
                 return self.add_marker_destination(args[1], parameter.name)
             if isinstance(args[1], Depends):
                 return self.add_dependency_destination(args[1], parameter.name)
+            if isinstance(args[1], Conflator) and issubclass(
+                get_origin(args[0]) or object, Emitter
+            ):
+                return self.add_duplex_emitter(
+                    get_args(args[0])[0], parameter.name, conflator=args[1]
+                )
+            if isinstance(args[1], DeltaTracker) and issubclass(
+                get_origin(args[0]) or object, Emitter
+            ):
+                return self.add_duplex_emitter(
+                    get_args(args[0])[0], parameter.name, delta_tracker=args[1]
+                )
             if get_origin(args[0]) is Emitter:
                 return self.add_duplex_emitter(args[1], parameter.name)
         self.add_body_field(parameter.name, parameter.annotation)
@@ -224,10 +296,28 @@ class RunnableBuilder:
 
 
 class DependencyBuilder(RunnableBuilder):
+    def __init__(
+        self,
+        function: Callable[..., Any],
+        possible_exceptions: list[EventException],
+        sub_dependencies: list[Depends],
+        builder_context: BuilderContext,
+        cache: DependencyCache | None = None,
+    ) -> None:
+        super().__init__(
+            function=function,
+            possible_exceptions=possible_exceptions,
+            sub_dependencies=sub_dependencies,
+            builder_context=builder_context,
+        )
+        self.cache = cache
+
     def build(self) -> BaseDependency:
         self.parse_parameters()
 
         if isasyncgenfunction(self.function):
+            if self.cache is not None:
+                raise TypeError("Contextual dependencies can not be cached")
             return ContextualDependency(
                 dependency_function=asynccontextmanager(self.function),
                 marker_destinations=self.marker_destinations.extract(),
@@ -242,6 +332,7 @@ class DependencyBuilder(RunnableBuilder):
             marker_destinations=self.marker_destinations.extract(),
             body_destinations=self.body_destinations.extract(),
             dependency_destinations=self.dependency_destinations.extract(),
+            cache=self.cache,
         )
 
 
@@ -255,6 +346,11 @@ class HandlerBuilder(RunnableBuilder, Generic[HandlerType]):
         function: Callable[..., Any],
         possible_exceptions: list[EventException],
         sub_dependencies: list[Depends],
+        concurrent_dependencies: bool = False,
+        timeout: float | None = None,
+        priority: int = 0,
+        validation_detail: ValidationDetail = "full",
+        payload_limits: PayloadLimits | None = None,
     ) -> None:
         super().__init__(
             function=function,
@@ -262,6 +358,11 @@ class HandlerBuilder(RunnableBuilder, Generic[HandlerType]):
             sub_dependencies=sub_dependencies,
             builder_context=BuilderContext(event_name=event_name),
         )
+        self.concurrent_dependencies = concurrent_dependencies
+        self.timeout = timeout
+        self.priority = priority
+        self.validation_detail = validation_detail
+        self.payload_limits = payload_limits
 
     def build_handler(self) -> HandlerType:
         raise NotImplementedError
@@ -310,10 +411,15 @@ class EventHandlerBuilder(HandlerBuilder[AsyncEventHandler]):
             marker_destinations=self.marker_destinations.extract(),
             body_model=self.context.build_body_model(),
             body_destinations=self.body_destinations.extract(),
-            dependency_definitions=self.context.build_dependency_definitions(),
+            dependency_layers=self.context.build_dependency_layers(),
+            concurrent_dependencies=self.concurrent_dependencies,
             dependency_destinations=self.dependency_destinations.extract(),
             possible_exceptions=self.context.possible_exceptions,
             ack_packager=ack_packager,
+            timeout=self.timeout,
+            priority=self.priority,
+            validation_detail=self.validation_detail,
+            payload_limits=self.payload_limits,
         )
 
     @classmethod
@@ -350,7 +456,8 @@ class ConnectHandlerBuilder(HandlerBuilder[AsyncConnectHandler]):
             marker_destinations=self.marker_destinations.extract(),
             body_model=self.context.build_body_model(),
             body_destinations=self.body_destinations.extract(),
-            dependency_definitions=self.context.build_dependency_definitions(),
+            dependency_layers=self.context.build_dependency_layers(),
+            concurrent_dependencies=self.concurrent_dependencies,
             dependency_destinations=self.dependency_destinations.extract(),
             possible_exceptions=self.context.possible_exceptions,
         )
@@ -390,7 +497,8 @@ class DisconnectHandlerBuilder(HandlerBuilder[AsyncDisconnectHandler]):
             async_callable=self.build_async_callable(),
             marker_definitions=self.context.build_marker_definitions(),
             marker_destinations=self.marker_destinations.extract(),
-            dependency_definitions=self.context.build_dependency_definitions(),
+            dependency_layers=self.context.build_dependency_layers(),
+            concurrent_dependencies=self.concurrent_dependencies,
             dependency_destinations=self.dependency_destinations.extract(),
         )
 
@@ -412,6 +520,35 @@ class DisconnectHandlerBuilder(HandlerBuilder[AsyncDisconnectHandler]):
         )
 
 
+async def open_connection_scope() -> None:
+    pass  # connection scopes only resolve dependencies
+
+
+class ConnectionScopeBuilder(HandlerBuilder[AsyncConnectionScopeHandler]):
+    def __init__(self, dependencies: list[Depends]) -> None:
+        super().__init__(
+            event_name="connect",
+            function=open_connection_scope,
+            possible_exceptions=[],
+            sub_dependencies=[],
+        )
+        self.context.is_connection_scope = True
+        for depends in dependencies:
+            self.add_sub_dependency(depends)
+
+    def build_handler(self) -> AsyncConnectionScopeHandler:
+        return AsyncConnectionScopeHandler(
+            async_callable=self.function,
+            marker_definitions=self.context.build_marker_definitions(),
+            marker_destinations=[],
+            body_model=self.context.build_body_model(),
+            body_destinations=[],
+            dependency_layers=self.context.build_dependency_layers(),
+            dependency_destinations=[],
+            possible_exceptions=self.context.possible_exceptions,
+        )
+
+
 EVENT_NAME_TO_HANDLER_BUILDER: dict[str, type[HandlerBuilder[Any]]] = {
     "connect": ConnectHandlerBuilder,
     "disconnect": DisconnectHandlerBuilder,
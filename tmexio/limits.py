@@ -0,0 +1,167 @@
+from asyncio import CancelledError, Future, get_running_loop
+from dataclasses import dataclass, field
+from heapq import heapify, heappop, heappush
+from itertools import count
+
+from tmexio.event_handlers import AsyncEventHandler
+from tmexio.exceptions import EventException
+from tmexio.packagers import ErrorPackager
+from tmexio.structures import ClientEvent
+from tmexio.types import DataOrTuple
+
+
+@dataclass()
+class ConcurrencyLimits:
+    total: int | None = None
+    per_event: int | None = None
+    per_sid: int | None = None
+    max_queued: int = 0  # waiters allowed for each of the limits above
+    event_overrides: dict[str, int] = field(default_factory=dict)
+
+    def for_event(self, event_name: str) -> int | None:
+        return self.event_overrides.get(event_name, self.per_event)
+
+
+class ConcurrencyLimit:
+    def __init__(
+        self, max_in_flight: int, max_queued: int, error: EventException
+    ) -> None:
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self.error = error
+
+        self.in_flight: int = 0
+        # heap of (-priority, arrival, future): higher priorities are served first
+        self.waiters: list[tuple[int, int, Future[None]]] = []
+        self.arrivals = count()
+
+    @property
+    def is_idle(self) -> bool:
+        return self.in_flight == 0 and len(self.waiters) == 0
+
+    def remove_waiter(self, future: Future[None]) -> None:
+        self.waiters = [waiter for waiter in self.waiters if waiter[2] is not future]
+        heapify(self.waiters)
+
+    def make_room(self, priority: int) -> None:
+        # a full queue only takes events that outrank the lowest waiting one
+        if len(self.waiters) != 0:
+            lowest = max(self.waiters, key=lambda waiter: (waiter[0], waiter[1]))
+            if -lowest[0] < priority:
+                self.remove_waiter(lowest[2])
+                lowest[2].set_exception(self.error)
+                return
+        raise self.error
+
+    async def acquire(self, priority: int = 0) -> None:
+        if self.in_flight < self.max_in_flight and len(self.waiters) == 0:
+            self.in_flight += 1
+            return
+        if len(self.waiters) >= self.max_queued:
+            self.make_room(priority)
+
+        future: Future[None] = get_running_loop().create_future()
+        heappush(self.waiters, (-priority, next(self.arrivals), future))
+        try:
+            await future  # the slot is handed over by `release`
+        except CancelledError:
+            if future.cancelled():
+                self.remove_waiter(future)
+            elif future.exception() is None:  # the slot was handed over already
+                self.release()
+            raise
+
+    def release(self) -> None:
+        while self.waiters:
+            _, _, future = heappop(self.waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.in_flight -= 1
+
+
+class ConcurrencyGuard:
+    error_packager: ErrorPackager = ErrorPackager()
+
+    too_many_events_error = EventException(429, "Too many concurrent events")
+    overloaded_error = EventException(503, "Server is overloaded")
+
+    def __init__(self, limits: ConcurrencyLimits) -> None:
+        self.limits = limits
+
+        self.total_limit: ConcurrencyLimit | None = None
+        if limits.total is not None:
+            self.total_limit = ConcurrencyLimit(
+                limits.total, limits.max_queued, self.overloaded_error
+            )
+        self.event_limits: dict[str, ConcurrencyLimit] = {}
+        self.sid_limits: dict[str, ConcurrencyLimit] = {}
+
+    def build_exceptions(self) -> list[EventException]:
+        exceptions: list[EventException] = []
+        if self.limits.per_sid is not None:
+            exceptions.append(self.too_many_events_error)
+        if (
+            self.limits.per_event is not None
+            or self.limits.total is not None
+            or self.limits.event_overrides
+        ):
+            exceptions.append(self.overloaded_error)
+        return exceptions
+
+    def select_limits(self, event: ClientEvent) -> list[ConcurrencyLimit]:
+        # per-sid limits go first, so one client can not fill the shared queues
+        limits: list[ConcurrencyLimit] = []
+        if self.limits.per_sid is not None:
+            limit = self.sid_limits.get(event.sid)
+            if limit is None:
+                limit = ConcurrencyLimit(
+                    self.limits.per_sid,
+                    self.limits.max_queued,
+                    self.too_many_events_error,
+                )
+                self.sid_limits[event.sid] = limit
+            limits.append(limit)
+        per_event = self.limits.for_event(event.event_name)
+        if per_event is not None:
+            limit = self.event_limits.get(event.event_name)
+            if limit is None:
+                limit = ConcurrencyLimit(
+                    per_event,
+                    self.limits.max_queued,
+                    self.overloaded_error,
+                )
+                self.event_limits[event.event_name] = limit
+            limits.append(limit)
+        if self.total_limit is not None:
+            limits.append(self.total_limit)
+        return limits
+
+    def release(self, event: ClientEvent, acquired: list[ConcurrencyLimit]) -> None:
+        for limit in reversed(acquired):
+            limit.release()
+        # idle keyed limits are dropped, so disconnected sids do not pile up
+        sid_limit = self.sid_limits.get(event.sid)
+        if sid_limit is not None and sid_limit.is_idle:
+            del self.sid_limits[event.sid]
+        event_limit = self.event_limits.get(event.event_name)
+        if event_limit is not None and event_limit.is_idle:
+            del self.event_limits[event.event_name]
+
+    async def run(self, handler: AsyncEventHandler, event: ClientEvent) -> DataOrTuple:
+        acquired: list[ConcurrencyLimit] = []
+        try:
+            for limit in self.select_limits(event):
+                await limit.acquire(handler.priority)
+                acquired.append(limit)
+        except EventException as e:
+            self.release(event, acquired)
+            return self.error_packager.pack_data(e)
+        except BaseException:
+            self.release(event, acquired)
+            raise
+
+        try:
+            return await handler(event)
+        finally:
+            self.release(event, acquired)
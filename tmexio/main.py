@@ -1,37 +1,84 @@
 from __future__ import annotations
 
-from collections.abc import Awaitable, Callable
-from copy import deepcopy
+from collections.abc import Awaitable, Callable, Mapping
+from dataclasses import replace
+from functools import partial
 from logging import Logger
+from types import MappingProxyType
 from typing import Any, Literal
 
 import socketio  # type: ignore[import-untyped]
+from pydantic import TypeAdapter, create_model
 from socketio.packet import Packet  # type: ignore[import-untyped]
 
-from tmexio.event_handlers import BaseAsyncHandler
+from tmexio.batching import EmitBatcher
+from tmexio.caches import DependencyCache
+from tmexio.client_batches import BatchDispatcher
+from tmexio.conflation import Conflator
+from tmexio.deltas import DeltaTracker
+from tmexio.event_handlers import AsyncEventHandler, BaseAsyncHandler
 from tmexio.exceptions import EventException
-from tmexio.handler_builders import Depends, pick_handler_class_by_event_name
+from tmexio.handler_builders import (
+    ConnectionScopeBuilder,
+    Depends,
+    pick_handler_class_by_event_name,
+)
+from tmexio.limits import ConcurrencyGuard, ConcurrencyLimits
 from tmexio.markers import ServerEmitterMarker
+from tmexio.payload_limits import PayloadLimits
+from tmexio.reporting import ExceptionReporter
 from tmexio.server import AsyncServer
 from tmexio.specs import EmitterSpec, HandlerSpec
 from tmexio.structures import ClientEvent
-from tmexio.types import AnyCallable, ASGIAppProtocol, DataOrTuple, DataType
+from tmexio.types import (
+    AnyCallable,
+    ASGIAppProtocol,
+    DataOrTuple,
+    DataType,
+    DependencyCacheKey,
+    DependencyScope,
+    ModelType,
+    ValidationDetail,
+)
 
 
 def register_dependency(
     exceptions: list[EventException] | None = None,
     dependencies: list[Depends] | None = None,
+    scope: DependencyScope = "event",
+    cache: DependencyCache | None = None,
 ) -> Callable[[AnyCallable], Depends]:
     def register_dependency_inner(function: AnyCallable) -> Depends:
         return Depends(
             function=function,
             exceptions=exceptions or [],
             dependencies=dependencies or [],
+            scope=scope,
+            cache=cache,
         )
 
     return register_dependency_inner
 
 
+EventDispatch = Callable[[ClientEvent], Awaitable[DataOrTuple]]
+
+
+def merge_body_models(name: str, *body_models: ModelType | None) -> ModelType | None:
+    models = [model for model in body_models if model is not None]
+    if len(models) < 2:
+        return models[0] if models else None
+
+    fields: dict[str, Any] = {}
+    for model in models:
+        if not isinstance(model, type):
+            raise TypeError("Only model classes can be merged")
+        fields.update(
+            (field_name, (field.annotation, field))
+            for field_name, field in model.model_fields.items()
+        )
+    return create_model(name, **fields)
+
+
 class EventRouter:
     def __init__(
         self,
@@ -41,6 +88,7 @@ class EventRouter:
     ) -> None:
         self.event_handlers: dict[str, tuple[BaseAsyncHandler, HandlerSpec]] = {}
         self.event_emitters: dict[str, EmitterSpec] = {}
+        self.connection_dependencies: dict[DependencyCacheKey, Depends] = {}
         self.default_dependencies = dependencies or []
         self.default_tags = tags or []
         # TODO these dependencies do not apply to included routers
@@ -49,6 +97,11 @@ class EventRouter:
         spec.tags = [*spec.tags, *self.default_tags]
         self.event_emitters[event_name] = spec
 
+    def add_connection_dependencies(
+        self, dependencies: dict[DependencyCacheKey, Depends]
+    ) -> None:
+        self.connection_dependencies.update(dependencies)
+
     def register_server_emitter(
         self,
         body_annotation: Any,
@@ -56,9 +109,16 @@ class EventRouter:
         summary: str | None = None,
         description: str | None = None,
         tags: list[str] | None = None,
+        always_validate: bool = False,
+        conflator: Conflator | None = None,
+        delta_tracker: DeltaTracker | None = None,
     ) -> ServerEmitterMarker[Any]:
         marker: ServerEmitterMarker[Any] = ServerEmitterMarker(
-            body_annotation=body_annotation, event_name=event_name
+            body_annotation=body_annotation,
+            event_name=event_name,
+            always_validate=always_validate,
+            conflator=conflator,
+            delta_tracker=delta_tracker,
         )
         self.add_emitter(
             event_name=event_name,
@@ -66,7 +126,7 @@ class EventRouter:
                 summary=summary,
                 description=description,
                 tags=tags or [],
-                body_model=marker.adapter,
+                body_model=marker.body_model,
             ),
         )
         return marker
@@ -91,6 +151,11 @@ class EventRouter:
         server_summary: str | None = None,
         server_description: str | None = None,
         server_tags: list[str] | None = None,
+        concurrent_dependencies: bool = False,
+        timeout: float | None = None,
+        priority: int = 0,
+        validation_detail: ValidationDetail = "full",
+        payload_limits: PayloadLimits | None = None,
     ) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
         handler_builder_class = pick_handler_class_by_event_name(event_name)
 
@@ -100,8 +165,16 @@ class EventRouter:
                 function=function,
                 possible_exceptions=exceptions or [],
                 sub_dependencies=self.default_dependencies + (dependencies or []),
+                concurrent_dependencies=concurrent_dependencies,
+                timeout=timeout,
+                priority=priority,
+                validation_detail=validation_detail,
+                payload_limits=payload_limits,
             )
             handler = handler_builder.build_handler()
+            self.add_connection_dependencies(
+                handler_builder.context.connection_dependencies
+            )
 
             self.add_handler(
                 event_name=event_name,
@@ -176,9 +249,11 @@ class EventRouter:
 
     def include_router(self, router: EventRouter) -> None:
         for event_name, (handler, handler_spec) in router.event_handlers.items():
-            self.add_handler(event_name, handler, deepcopy(handler_spec))
+            # specs are only reassigned (never mutated), so shallow copies suffice
+            self.add_handler(event_name, handler, replace(handler_spec))
         for event_name, emitter_spec in router.event_emitters.items():
-            self.add_emitter(event_name, deepcopy(emitter_spec))
+            self.add_emitter(event_name, replace(emitter_spec))
+        self.add_connection_dependencies(router.connection_dependencies)
 
 
 class TMEXIO(EventRouter):
@@ -191,6 +266,8 @@ class TMEXIO(EventRouter):
         always_connect: bool = False,
         serializer: type[Packet] = Packet,
         tags: list[str] | None = None,
+        concurrency_limits: ConcurrencyLimits | None = None,
+        exception_reporter: ExceptionReporter | None = None,
         **kwargs: Any,
     ) -> None:
         super().__init__(tags=tags)
@@ -203,7 +280,121 @@ class TMEXIO(EventRouter):
             engineio_logger=engineio_logger,
             **kwargs,
         )
-        self.server = AsyncServer(backend=self.backend)
+        self.server = AsyncServer(
+            backend=self.backend,
+            exception_reporter=exception_reporter,
+        )
+
+        self.connect_handler: BaseAsyncHandler | None = None
+        self.disconnect_handler: BaseAsyncHandler | None = None
+        self._connection_scope_handler: BaseAsyncHandler | None = None
+        self.connect_spec: HandlerSpec | None = None  # without connection dependencies
+
+        self.concurrency_guard: ConcurrencyGuard | None = None
+        if concurrency_limits is not None:
+            self.concurrency_guard = ConcurrencyGuard(concurrency_limits)
+        # batch events are not limited themselves, each of their entries is
+        self.client_batch_events: set[str] = set()
+
+        self.backend.on("connect", handler=self.handle_connect, namespace="/")
+        self.backend.on("disconnect", handler=self.handle_disconnect, namespace="/")
+        # TODO support for multiple namespaces
+        self.backend.on("*", handler=self.dispatch_event, namespace="/")
+
+        self.dispatch_map: Mapping[str, EventDispatch] | None = None
+
+    @property
+    def connection_scope_handler(self) -> BaseAsyncHandler | None:
+        if self._connection_scope_handler is None and self.connection_dependencies:
+            self._connection_scope_handler = ConnectionScopeBuilder(
+                dependencies=list(self.connection_dependencies.values())
+            ).build_handler()
+        return self._connection_scope_handler
+
+    def add_connection_dependencies(
+        self, dependencies: dict[DependencyCacheKey, Depends]
+    ) -> None:
+        if dependencies.keys() - self.connection_dependencies.keys():
+            self._connection_scope_handler = None
+            super().add_connection_dependencies(dependencies)
+            self.update_connect_spec()
+
+    @property
+    def auth_owned_by_connection_scope(self) -> bool:
+        # a connect handler without a body ignores auth used by connection dependencies
+        scope_handler = self.connection_scope_handler
+        return (
+            scope_handler is not None
+            and scope_handler.body_model is not None
+            and self.connect_handler is not None
+            and self.connect_handler.body_model is None
+        )
+
+    def update_connect_spec(self) -> None:
+        # connection dependencies are resolved on connect, so they are documented there
+        scope_handler = self.connection_scope_handler
+        if scope_handler is None:
+            return
+
+        spec = self.connect_spec or HandlerSpec(
+            summary=None,
+            description=None,
+            tags=list(self.default_tags),
+            body_model=None,
+            ack=None,
+            exceptions=[],
+        )
+        exceptions = spec.exceptions
+        if self.auth_owned_by_connection_scope:
+            exceptions = [
+                exception
+                for exception in exceptions
+                if exception is not scope_handler.zero_arguments_expected_error
+            ]
+        scope_exceptions = sorted(
+            scope_handler.possible_exceptions - set(exceptions),
+            key=lambda exception: exception.code,
+        )
+        self.event_handlers["connect"] = self.connect_handler or scope_handler, replace(
+            spec,
+            exceptions=[*exceptions, *scope_exceptions],
+            body_model=merge_body_models(
+                "connect.InputModel", spec.body_model, scope_handler.body_model
+            ),
+        )
+
+    async def handle_connect(
+        self, sid: str, _environ: Any, auth: DataType = None
+    ) -> DataOrTuple:
+        event = ClientEvent(self.server, "connect", sid, auth)
+
+        if self.connection_scope_handler is not None:
+            await self.connection_scope_handler(event)
+            if (
+                self.connect_handler is not None
+                and self.connect_handler.body_model is None
+            ):
+                # auth fields belong to connection dependencies, not to the handler
+                event = ClientEvent(self.server, "connect", sid)
+
+        if self.connect_handler is None:
+            return None
+
+        try:
+            return await self.connect_handler(event)
+        except BaseException:
+            await self.server.close_connection_scope(sid)
+            raise
+
+    async def handle_disconnect(self, sid: str) -> DataOrTuple:
+        try:
+            if self.disconnect_handler is None:
+                return None
+            return await self.disconnect_handler(
+                ClientEvent(self.server, "disconnect", sid)
+            )
+        finally:
+            await self.server.close_connection_scope(sid)
 
     def add_handler(
         self,
@@ -211,37 +402,132 @@ class TMEXIO(EventRouter):
         handler: BaseAsyncHandler,
         spec: HandlerSpec,
     ) -> None:
-        super().add_handler(event_name=event_name, handler=handler, spec=spec)
+        if (
+            isinstance(handler, AsyncEventHandler)
+            and handler.ack_packager.pre_encoded
+            and not self.server.supports_raw_json
+        ):
+            raise TypeError(
+                f"Handler for '{event_name}' uses pre-encoded acks, "
+                "which require a serializer with raw JSON support"
+            )
+        if (
+            isinstance(handler, AsyncEventHandler)
+            and handler.payload_limits is not None
+            and handler.payload_limits.max_size is not None
+            and not self.server.supports_raw_json
+        ):
+            raise TypeError(
+                f"Handler for '{event_name}' limits the body size, "
+                "which requires a serializer with raw JSON support"
+            )
 
-        if event_name == "connect":
+        guard = self.guard_for(event_name, handler)
+        if guard is not None:
+            spec.exceptions = [*spec.exceptions, *guard.build_exceptions()]
 
-            async def add_handler_inner(
-                sid: str, _environ: Any, auth: DataType = None
-            ) -> DataOrTuple:
-                return await handler(ClientEvent(self.server, "connect", sid, auth))
+        super().add_handler(event_name=event_name, handler=handler, spec=spec)
 
+        if event_name == "connect":
+            self.connect_handler = handler
+            self.connect_spec = spec
+            self.update_connect_spec()
+            return
         elif event_name == "disconnect":
+            self.disconnect_handler = handler
+            return
+
+        self.dispatch_map = None  # rebuilt by the next compile
+
+    def guard_for(
+        self, event_name: str, handler: BaseAsyncHandler
+    ) -> ConcurrencyGuard | None:
+        if (
+            not isinstance(handler, AsyncEventHandler)
+            or event_name in self.client_batch_events
+        ):
+            return None
+        return self.concurrency_guard
+
+    def compile(self) -> Mapping[str, EventDispatch]:
+        # only builds the dispatch map: tags and specs of included routers are
+        # applied in `include_router`, so documentation works without compiling
+        dispatch_map: dict[str, EventDispatch] = {}
+        for event_name, (handler, _) in self.event_handlers.items():
+            if event_name in {"connect", "disconnect"}:
+                continue
+            guard = self.guard_for(event_name, handler)
+            if guard is not None and isinstance(handler, AsyncEventHandler):
+                dispatch_map[event_name] = partial(guard.run, handler)
+            else:
+                dispatch_map[event_name] = handler
+
+        self.dispatch_map = MappingProxyType(dispatch_map)
+        return self.dispatch_map
+
+    async def dispatch_event(self, event_name: str, sid: str, *args: DataType) -> Any:
+        dispatch_map = self.dispatch_map
+        if dispatch_map is None:
+            dispatch_map = self.compile()
+
+        dispatch = dispatch_map.get(event_name)
+        if dispatch is None:
+            dispatch = dispatch_map.get("*")
+            if dispatch is None:
+                return self.backend.not_handled
+        return await dispatch(ClientEvent(self.server, event_name, sid, *args))
+
+    def enable_client_batches(
+        self,
+        event_name: str = "batch",
+        max_entries: int = 100,
+        concurrent: bool = False,
+        summary: str | None = "Batch of client events",
+        description: str | None = (
+            "Dispatches each [event_name, body] entry to its handler "
+            "and acks with the list of [code, body] acks of all entries"
+        ),
+        tags: list[str] | None = None,
+    ) -> BatchDispatcher:
+        dispatcher = BatchDispatcher(
+            server=self.server,
+            event_handlers=self.event_handlers,
+            event_name=event_name,
+            max_entries=max_entries,
+            concurrent=concurrent,
+            concurrency_guard=self.concurrency_guard,
+        )
+        self.client_batch_events.add(event_name)
+        self.on(
+            event_name=event_name,
+            summary=summary,
+            description=description,
+            tags=tags,
+            exceptions=[dispatcher.too_many_entries_error],
+        )(dispatcher.build_handler())
+        return dispatcher
 
-            async def add_handler_inner(sid: str) -> DataOrTuple:  # type: ignore[misc]
-                return await handler(ClientEvent(self.server, "disconnect", sid))
-
-        elif event_name == "*":
-
-            async def add_handler_inner(  # type: ignore[misc]
-                event: str, sid: str, *args: DataType
-            ) -> DataOrTuple:
-                return await handler(ClientEvent(self.server, event, sid, *args))
-
-        else:
-
-            async def add_handler_inner(sid: str, *args: DataType) -> DataOrTuple:  # type: ignore[misc]
-                return await handler(ClientEvent(self.server, event_name, sid, *args))
-
-        self.backend.on(
-            event=event_name,
-            handler=add_handler_inner,
-            namespace="/",  # TODO support for multiple namespaces
+    def enable_emit_batching(
+        self,
+        interval: float = 0,
+        event_name: str = "batch",
+        summary: str | None = "Batch of server events",
+        description: str | None = (
+            "Several events for the same client, collected within the batching "
+            "interval. Each entry is a list of the event name and its arguments"
+        ),
+        tags: list[str] | None = None,
+    ) -> EmitBatcher:
+        self.add_emitter(
+            event_name=event_name,
+            spec=EmitterSpec(
+                summary=summary,
+                description=description,
+                tags=tags or [],
+                body_model=TypeAdapter(list[list[Any]]),
+            ),
         )
+        return self.server.enable_batching(interval=interval, event_name=event_name)
 
     def build_asgi_app(
         self,
@@ -251,6 +537,7 @@ class TMEXIO(EventRouter):
         on_startup: Callable[[], Awaitable[None]] | None = None,
         on_shutdown: Callable[[], Awaitable[None]] | None = None,
     ) -> ASGIAppProtocol:
+        self.compile()
         return socketio.ASGIApp(  # type: ignore[no-any-return]
             socketio_server=self.backend,
             other_asgi_app=other_asgi_app,
@@ -2,52 +2,134 @@ from typing import Annotated, Any, Generic, TypeVar
 
 from pydantic import TypeAdapter
 
+from tmexio.conflation import ConflatingEmitter, Conflator
+from tmexio.deltas import DeltaEmitter, DeltaTracker
 from tmexio.server import AsyncServer, AsyncSocket, Emitter
 from tmexio.structures import ClientEvent
+from tmexio.types import trusted_type_of
 
 T = TypeVar("T")
 
 
 class Marker(Generic[T]):
+    __slots__ = ()
+
     def extract(self, event: ClientEvent) -> T:
         raise NotImplementedError
 
 
 class EventNameMarker(Marker[str]):
+    __slots__ = ()
+
     def extract(self, event: ClientEvent) -> str:
         return event.event_name
 
 
 class SidMarker(Marker[str]):
+    __slots__ = ()
+
     def extract(self, event: ClientEvent) -> str:
         return event.sid
 
 
 class AsyncServerMarker(Marker[AsyncServer]):
+    __slots__ = ()
+
     def extract(self, event: ClientEvent) -> AsyncServer:
         return event.server
 
 
 class AsyncSocketMarker(Marker[AsyncSocket]):
+    __slots__ = ()
+
     def extract(self, event: ClientEvent) -> AsyncSocket:
         return event.socket
 
 
 class ClientEventMarker(Marker[ClientEvent]):
+    __slots__ = ()
+
     def extract(self, event: ClientEvent) -> ClientEvent:
         return event
 
 
+class ConnectionDependencyMarker(Marker[Any]):
+    __slots__ = ("dependency_key",)
+
+    def __init__(self, dependency_key: Any) -> None:
+        self.dependency_key = dependency_key
+
+    def __eq__(self, other: object) -> bool:
+        return (
+            isinstance(other, ConnectionDependencyMarker)
+            and other.dependency_key == self.dependency_key
+        )
+
+    def __hash__(self) -> int:
+        return hash(self.dependency_key)
+
+    def extract(self, event: ClientEvent) -> Any:
+        connection_scope = event.server.connection_scopes[event.sid]
+        return connection_scope.values[self.dependency_key]
+
+
 class ServerEmitterMarker(Marker[Emitter[T]]):
-    def __init__(self, body_annotation: Any, event_name: str) -> None:
+    __slots__ = (
+        "event_name",
+        "adapter",
+        "trusted_type",
+        "conflator",
+        "delta_tracker",
+        "body_model",
+    )
+
+    def __init__(
+        self,
+        body_annotation: Any,
+        event_name: str,
+        always_validate: bool = False,
+        conflator: Conflator | None = None,
+        delta_tracker: DeltaTracker | None = None,
+    ) -> None:
+        if conflator is not None and delta_tracker is not None:
+            raise TypeError("Emitters can not be both conflating and delta-based")
         self.event_name = event_name
+        self.conflator = conflator
+        self.delta_tracker = delta_tracker
         self.adapter = TypeAdapter(body_annotation)
+        # documented payload, delta emitters send an envelope instead of the body
+        self.body_model: TypeAdapter[Any] = (
+            self.adapter
+            if delta_tracker is None
+            else delta_tracker.build_envelope_adapter(body_annotation, event_name)
+        )
+        # instances of a model class annotation are dumped without re-validation
+        self.trusted_type: type[Any] | None = (
+            None if always_validate else trusted_type_of(body_annotation)
+        )
 
     def extract(self, event: ClientEvent) -> Emitter[T]:
+        if self.delta_tracker is not None:
+            return DeltaEmitter(
+                socket=event.socket,
+                event_name=self.event_name,
+                adapter=self.adapter,
+                tracker=self.delta_tracker,
+                trusted_type=self.trusted_type,
+            )
+        if self.conflator is not None:
+            return ConflatingEmitter(
+                socket=event.socket,
+                event_name=self.event_name,
+                adapter=self.adapter,
+                conflator=self.conflator,
+                trusted_type=self.trusted_type,
+            )
         return Emitter(
             socket=event.socket,
             event_name=self.event_name,
             adapter=self.adapter,
+            trusted_type=self.trusted_type,
         )
 
 
@@ -1,9 +1,11 @@
-from typing import Any, Generic, TypeVar, cast
+from collections.abc import Sequence
+from typing import Any, Generic, TypeVar, cast, get_args, get_origin
 
 from pydantic import BaseModel, TypeAdapter
 
 from tmexio.exceptions import EventException
-from tmexio.types import DataOrTuple, DataType
+from tmexio.packets import RawJSON
+from tmexio.types import DataOrTuple, DataType, trusted_type_of
 
 PackedType = TypeVar("PackedType")
 
@@ -15,10 +17,12 @@ class BasePackager(Generic[PackedType]):
 
 class ErrorPackager(BasePackager[EventException]):
     def pack_data(self, data: EventException) -> DataOrTuple:
-        return data.code, data.ack_body
+        return data.packed
 
 
 class CodedPackager(Generic[PackedType], BasePackager[PackedType]):
+    pre_encoded: bool = False
+
     def __init__(self, code: int = 200) -> None:
         self.code = code
 
@@ -44,16 +48,55 @@ class NoContentPackager(CodedPackager[None]):
 
 
 class PydanticPackager(CodedPackager[Any]):
-    def __init__(self, annotation: Any, code: int = 200) -> None:
+    collection_origins: set[Any] = {list, Sequence}
+
+    def __init__(
+        self,
+        annotation: Any,
+        code: int = 200,
+        pre_encoded: bool = False,
+    ) -> None:
         super().__init__(code=code)
         self.adapter = TypeAdapter(annotation)
+        self.pre_encoded = pre_encoded
+
+        # values that already match these are serialized in a single pass
+        self.trusted_type: type[Any] | None = trusted_type_of(annotation)
+        self.trusted_item_type: type[Any] | None = None
+        if get_origin(annotation) in self.collection_origins:
+            args = get_args(annotation)
+            if len(args) == 1:
+                self.trusted_item_type = trusted_type_of(args[0])
+
+    def is_trusted(self, data: Any) -> bool:
+        if self.trusted_type is not None:
+            return isinstance(data, self.trusted_type)
+        if self.trusted_item_type is not None and isinstance(data, list):
+            return all(isinstance(item, self.trusted_item_type) for item in data)
+        return False
 
     def pack_body(self, data: Any) -> DataType:
-        validated_data = self.adapter.validate_python(data, from_attributes=True)
+        if not self.is_trusted(data):
+            data = self.adapter.validate_python(data, from_attributes=True)
+        if self.pre_encoded:
+            encoded = self.adapter.dump_json(data, by_alias=True).decode()
+            return cast(DataType, RawJSON(encoded))
         return cast(
             DataType,
-            self.adapter.dump_python(validated_data, mode="json", by_alias=True),
+            self.adapter.dump_python(data, mode="json", by_alias=True),
         )
 
     def build_body_model(self) -> TypeAdapter[Any]:
         return self.adapter
+
+
+class PassthroughPackager(CodedPackager[Any]):
+    def __init__(self, annotation: Any, code: int = 200) -> None:
+        super().__init__(code=code)
+        self.adapter = TypeAdapter(annotation)  # only used for documentation
+
+    def pack_body(self, data: Any) -> DataType:
+        return cast(DataType, data)
+
+    def build_body_model(self) -> TypeAdapter[Any]:
+        return self.adapter
@@ -0,0 +1,99 @@
+from json.decoder import scanstring  # type: ignore[attr-defined]
+from typing import Any
+
+from pydantic_core import from_json, to_json
+from socketio.packet import Packet  # type: ignore[import-untyped]
+
+
+def event_arguments(data: Any) -> list[Any]:
+    # same as socketio: tuples are expanded to multiple arguments
+    if isinstance(data, tuple):
+        return list(data)
+    return [] if data is None else [data]
+
+
+class RawJSON:
+    __slots__ = ("encoded",)
+
+    def __init__(self, encoded: str) -> None:
+        self.encoded = encoded
+
+
+class RawArguments:
+    __slots__ = ("encoded",)
+
+    def __init__(self, encoded: str) -> None:
+        self.encoded = encoded  # JSON array of all arguments after the event name
+
+    def decode(self) -> list[Any]:
+        return from_json(self.encoded, cache_strings=False)  # type: ignore[no-any-return]
+
+
+class PydanticCoreJSON:
+    @staticmethod
+    def has_raw_json(item: Any) -> bool:
+        if isinstance(item, list):
+            return any(PydanticCoreJSON.has_raw_json(sub_item) for sub_item in item)
+        return isinstance(item, RawJSON)
+
+    @staticmethod
+    def dumps(data: Any, separators: Any = None) -> str:
+        # output is always compact, `separators` are accepted for compatibility
+        if isinstance(data, RawJSON):
+            return data.encoded
+        if isinstance(data, list) and any(
+            PydanticCoreJSON.has_raw_json(item) for item in data
+        ):
+            # pre-encoded values inside (nested) lists are spliced as is
+            return f"[{','.join(PydanticCoreJSON.dumps(item) for item in data)}]"
+        return to_json(data).decode()
+
+    @staticmethod
+    def loads(data: str | bytes) -> Any:
+        return from_json(data, cache_strings=False)
+
+
+class LazyEventJSON(PydanticCoreJSON):
+    @staticmethod
+    def loads(data: str | bytes) -> Any:
+        # only the event name is decoded, arguments are left for the handler
+        if isinstance(data, str) and data.startswith('["'):
+            try:
+                event_name, end = scanstring(data, 2)
+            except ValueError:
+                return PydanticCoreJSON.loads(data)
+            rest = data[end:].lstrip()
+            # `["event",]` is left to the full decoder, which rejects it
+            if rest.startswith(",") and not rest[1:].lstrip().startswith("]"):
+                return [event_name, RawArguments(f"[{rest[1:]}")]
+        return PydanticCoreJSON.loads(data)
+
+
+class PydanticJSONPacket(Packet):  # type: ignore[misc]
+    json = PydanticCoreJSON
+    supports_raw_json = True
+    raw_event_arguments = True
+
+    def decode(self, encoded_packet: Any) -> int:
+        if not (
+            self.raw_event_arguments
+            and isinstance(encoded_packet, str)
+            and encoded_packet.startswith("2")  # EVENT, not BINARY_EVENT
+        ):
+            return super().decode(encoded_packet)  # type: ignore[no-any-return]
+
+        self.json = LazyEventJSON
+        try:
+            return super().decode(encoded_packet)  # type: ignore[no-any-return]
+        finally:
+            del self.json
+
+    def _data_is_binary(self, data: Any) -> bool:
+        # same as upstream, but short-circuits instead of reducing full lists
+        if isinstance(data, bytes):
+            return True
+        elif isinstance(data, list):
+            return any(self._data_is_binary(item) for item in data)
+        elif isinstance(data, dict):
+            return any(self._data_is_binary(item) for item in data.values())
+        return False
@@ -0,0 +1,58 @@
+from collections.abc import Iterator, Sequence
+from dataclasses import dataclass
+from typing import Any
+
+from pydantic_core import to_json
+
+from tmexio.exceptions import EventException
+from tmexio.packets import RawArguments
+
+
+@dataclass(frozen=True)
+class PayloadLimits:
+    max_size: int | None = None  # characters of the raw JSON arguments
+    max_list_length: int | None = None
+    max_depth: int | None = None
+
+    too_large_error = EventException(413, "Event body is too large")
+    too_deep_error = EventException(422, "Event body is too deeply nested")
+
+    @property
+    def checks_shape(self) -> bool:
+        return self.max_list_length is not None or self.max_depth is not None
+
+    def build_exceptions(self) -> Iterator[EventException]:
+        if self.max_size is not None or self.max_list_length is not None:
+            yield self.too_large_error
+        if self.max_depth is not None:
+            yield self.too_deep_error
+
+    def check_shape(self, arguments: Sequence[Any]) -> None:
+        # iterative walk that stops at the first violation, nothing is copied
+        stack: list[tuple[Any, int]] = [(argument, 1) for argument in arguments]
+        while stack:
+            item, depth = stack.pop()
+            if isinstance(item, dict):
+                items: Any = item.values()
+            elif isinstance(item, list):
+                if (
+                    self.max_list_length is not None
+                    and len(item) > self.max_list_length
+                ):
+                    raise self.too_large_error
+                items = item
+            else:
+                continue
+
+            if self.max_depth is not None and depth > self.max_depth:
+                raise self.too_deep_error
+            stack.extend((sub_item, depth + 1) for sub_item in items)
+
+    def check_size(self, raw_args: RawArguments) -> None:
+        if self.max_size is not None and len(raw_args.encoded) > self.max_size:
+            raise self.too_large_error
+
+    def check_decoded_size(self, arguments: Sequence[Any]) -> None:
+        # arguments without raw JSON (e.g. client batch entries) are measured re-encoded
+        if self.max_size is not None and len(to_json(arguments)) > self.max_size:
+            raise self.too_large_error
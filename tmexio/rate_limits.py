@@ -0,0 +1,79 @@
+from collections.abc import Callable, Hashable
+from inspect import signature
+from time import monotonic
+from typing import Any
+
+from tmexio.exceptions import EventException
+from tmexio.handler_builders import Depends
+from tmexio.markers import EventName, Sid
+
+
+def sid_and_event_key(sid: Sid, event_name: EventName) -> Hashable:
+    return sid, event_name
+
+
+class TokenBucketStore:
+    def __init__(
+        self,
+        rate: float,
+        capacity: float,
+        eviction_interval: float = 60,
+    ) -> None:
+        self.rate = rate  # tokens restored per second
+        self.capacity = capacity
+        self.eviction_interval = eviction_interval
+
+        self.buckets: dict[Hashable, tuple[float, float]] = {}  # tokens, updated at
+        self.next_eviction: float = monotonic() + eviction_interval
+
+    def refill(self, tokens: float, updated_at: float, now: float) -> float:
+        return min(self.capacity, tokens + (now - updated_at) * self.rate)
+
+    def consume(self, key: Hashable, cost: float = 1) -> bool:
+        now = monotonic()
+        if now >= self.next_eviction:
+            self.evict_idle(now)
+
+        bucket = self.buckets.get(key)
+        tokens = self.capacity if bucket is None else self.refill(*bucket, now)
+        if tokens < cost:
+            self.buckets[key] = tokens, now
+            return False
+        self.buckets[key] = tokens - cost, now
+        return True
+
+    def evict_idle(self, now: float | None = None) -> None:
+        # full buckets are the same as missing ones, so they can be dropped
+        now = monotonic() if now is None else now
+        self.buckets = {
+            key: bucket
+            for key, bucket in self.buckets.items()
+            if self.refill(*bucket, now) < self.capacity
+        }
+        self.next_eviction = now + self.eviction_interval
+
+
+def rate_limit(
+    rate: float,
+    capacity: float | None = None,
+    key: Callable[..., Hashable] = sid_and_event_key,
+    store: TokenBucketStore | None = None,
+    error: EventException | None = None,
+) -> Depends:
+    # `key` parameters are resolved like any other dependency parameters
+    bucket_store = store or TokenBucketStore(rate=rate, capacity=capacity or rate)
+    rate_limited_error = error or EventException(429, "Rate limit exceeded")
+
+    async def check_rate_limit(**kwargs: Any) -> None:
+        if not bucket_store.consume(key(**kwargs)):
+            raise rate_limited_error
+
+    check_rate_limit.__signature__ = signature(  # type: ignore[attr-defined]
+        key
+    ).replace(return_annotation=None)
+
+    return Depends(
+        function=check_rate_limit,
+        exceptions=[rate_limited_error],
+        dependencies=[],
+    )
@@ -0,0 +1,47 @@
+from collections import Counter
+from logging import Logger, getLogger
+from time import monotonic
+
+from tmexio.exceptions import EventException, UndocumentedExceptionWarning
+
+ReportKey = tuple[str, int]  # event name and exception code
+
+
+class ExceptionReporter:
+    def __init__(
+        self,
+        strict: bool = False,
+        log_interval: float = 60,
+        logger: Logger | None = None,
+    ) -> None:
+        self.strict = strict
+        self.log_interval = log_interval
+        self.logger = logger or getLogger("tmexio")
+
+        self.counters: Counter[ReportKey] = Counter()
+        self.last_logged: dict[ReportKey, float] = {}
+
+    def report(self, event_name: str, exception: EventException) -> None:
+        if self.strict:
+            raise UndocumentedExceptionWarning(exception) from exception
+
+        key: ReportKey = event_name, exception.code
+        self.counters[key] += 1
+
+        # each key is logged at most once per interval, repeats are only counted
+        now = monotonic()
+        last_logged = self.last_logged.get(key)
+        if last_logged is None or now - last_logged >= self.log_interval:
+            self.last_logged[key] = now
+            self.logger.warning(
+                "Undocumented exception %r with code %d was raised in '%s' "
+                "(%d times so far)",
+                exception.ack_body,
+                exception.code,
+                event_name,
+                self.counters[key],
+            )
+
+    def reset(self) -> None:
+        self.counters.clear()
+        self.last_logged.clear()
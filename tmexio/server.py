@@ -1,50 +1,217 @@
-from contextlib import AbstractAsyncContextManager
+from asyncio import create_task, wait
+from collections.abc import Hashable
+from contextlib import AbstractAsyncContextManager, AsyncExitStack
+from dataclasses import dataclass
 from typing import Any, Generic, Literal, TypeVar, cast
 
 import socketio  # type: ignore[import-untyped]
+from engineio import packet as eio_packet  # type: ignore[import-untyped]
 from pydantic import TypeAdapter
+from socketio import packet
+from socketio.async_pubsub_manager import (  # type: ignore[import-untyped]
+    AsyncPubSubManager,
+)
 
-from tmexio.types import CallbackProtocol, DataOrTuple, DataType
+from tmexio.batching import EmitBatcher
+from tmexio.packets import RawJSON, event_arguments
+from tmexio.reporting import ExceptionReporter
+from tmexio.types import CallbackProtocol, DataOrTuple, DataType, Recipients
+
+
+class ConnectionScope:
+    def __init__(self) -> None:
+        self.stack = AsyncExitStack()
+        self.values: dict[Any, Any] = {}
+
+
+def normalize_recipients(recipients: Recipients) -> str | list[str] | None:
+    if recipients is None or isinstance(recipients, str):
+        return recipients
+    return list(dict.fromkeys(recipients))
+
+
+def freeze_recipients(recipients: Recipients) -> Hashable:
+    normalized = normalize_recipients(recipients)
+    if isinstance(normalized, list):
+        return tuple(normalized)
+    return normalized
+
+
+def exclude_sid(skip_sid: Recipients, sid: str) -> list[str]:
+    if skip_sid is None:
+        return [sid]
+    if isinstance(skip_sid, str):
+        return [skip_sid, sid]
+    return [*skip_sid, sid]
+
+
+def is_empty(recipients: Recipients) -> bool:
+    return not isinstance(recipients, str | None) and len(recipients) == 0
+
+
+@dataclass(frozen=True)
+class PreparedEvent:
+    event: str
+    data: DataOrTuple | dict[str, Any]
+    namespace: str
+    eio_packets: tuple[eio_packet.Packet, ...]
 
 
 class AsyncServer:
-    def __init__(self, backend: socketio.AsyncServer) -> None:
+    def __init__(
+        self,
+        backend: socketio.AsyncServer,
+        exception_reporter: ExceptionReporter | None = None,
+    ) -> None:
         self.backend = backend
+        self.exception_reporter = exception_reporter or ExceptionReporter()
+        self.connection_scopes: dict[str, ConnectionScope] = {}
+        self.supports_raw_json: bool = getattr(
+            backend.packet_class, "supports_raw_json", False
+        )
+
+        self.batcher: EmitBatcher | None = None
+
+    def enable_batching(
+        self, interval: float = 0, event_name: str = "batch"
+    ) -> EmitBatcher:
+        self.batcher = EmitBatcher(
+            backend=self.backend,
+            interval=interval,
+            event_name=event_name,
+            supports_raw_json=self.supports_raw_json,
+        )
+        return self.batcher
+
+    async def flush_batches(self) -> None:
+        # events that are not batched must not overtake the ones already batched
+        if self.batcher is not None and len(self.batcher.pending) != 0:
+            await self.batcher.flush()
+
+    async def close_connection_scope(self, sid: str) -> None:
+        connection_scope = self.connection_scopes.pop(sid, None)
+        if connection_scope is not None:
+            await connection_scope.stack.aclose()
 
     async def emit(
         self,
         event: str,
         # TODO proper support for pydantic `data`
         data: DataOrTuple | dict[str, Any],
-        target: str | None = None,
-        skip_sid: str | None = None,
+        target: Recipients = None,
+        skip_sid: Recipients = None,
         namespace: str | None = None,
         callback: CallbackProtocol | None = None,
         ignore_queue: bool = False,
     ) -> None:
+        if is_empty(target):
+            return
+        if (
+            self.batcher is not None
+            and callback is None
+            and (
+                ignore_queue or not isinstance(self.backend.manager, AsyncPubSubManager)
+            )
+        ):
+            self.batcher.add(
+                event=event,
+                data=data,
+                target=normalize_recipients(target),
+                skip_sid=normalize_recipients(skip_sid),
+                namespace=namespace,
+            )
+            return
+        await self.flush_batches()
         await self.backend.emit(
             event=event,
             data=data,
-            to=target,
-            skip_sid=skip_sid,
+            to=normalize_recipients(target),
+            skip_sid=normalize_recipients(skip_sid),
             namespace=namespace,
             callback=callback,
             ignore_queue=ignore_queue,
         )
 
+    def prepare(
+        self,
+        event: str,
+        data: DataOrTuple | dict[str, Any],
+        namespace: str | None = None,
+    ) -> PreparedEvent:
+        namespace = namespace or "/"
+        encoded_packet = self.backend.packet_class(
+            packet.EVENT, namespace=namespace, data=[event, *event_arguments(data)]
+        ).encode()
+        if not isinstance(encoded_packet, list):
+            encoded_packet = [encoded_packet]
+        return PreparedEvent(
+            event=event,
+            data=data,
+            namespace=namespace,
+            eio_packets=tuple(
+                eio_packet.Packet(eio_packet.MESSAGE, encoded)
+                for encoded in encoded_packet
+            ),
+        )
+
+    async def emit_prepared(
+        self,
+        prepared: PreparedEvent,
+        target: Recipients = None,
+        skip_sid: Recipients = None,
+        ignore_queue: bool = False,
+    ) -> None:
+        if is_empty(target):
+            return
+
+        manager = self.backend.manager
+        # the public emit encodes the packet again for every call, so the loop of
+        # AsyncManager.emit is mirrored below with the packets from `prepare`;
+        # `_send_eio_packet` is private API of python-socketio 5.11, the public emit
+        # is used if it ever disappears
+        await self.flush_batches()
+        send_eio_packet = getattr(self.backend, "_send_eio_packet", None)
+        if send_eio_packet is None or (
+            isinstance(manager, AsyncPubSubManager) and not ignore_queue
+        ):
+            # other workers have to receive the event through the queue as well
+            await self.backend.emit(
+                event=prepared.event,
+                data=prepared.data,
+                to=normalize_recipients(target),
+                skip_sid=normalize_recipients(skip_sid),
+                namespace=prepared.namespace,
+            )
+            return
+
+        skipped_sids = {skip_sid} if isinstance(skip_sid, str) else set(skip_sid or ())
+
+        # participants of all target rooms are collected into one deduplicated dict
+        tasks = [
+            create_task(send_eio_packet(eio_sid, eio_pkt))
+            for sid, eio_sid in manager.get_participants(prepared.namespace, target)
+            if sid not in skipped_sids
+            for eio_pkt in prepared.eio_packets
+        ]
+        if tasks:
+            await wait(tasks)
+
     async def send(
         self,
         data: DataOrTuple,
-        target: str | None = None,
-        skip_sid: str | None = None,
+        target: Recipients = None,
+        skip_sid: Recipients = None,
         namespace: str | None = None,
         callback: CallbackProtocol | None = None,
         ignore_queue: bool = False,
     ) -> None:
+        if is_empty(target):
+            return
+        await self.flush_batches()
         await self.backend.send(
             data=data,
-            to=target,
-            skip_sid=skip_sid,
+            to=normalize_recipients(target),
+            skip_sid=normalize_recipients(skip_sid),
             namespace=namespace,
             callback=callback,
             ignore_queue=ignore_queue,
@@ -59,6 +226,7 @@ class AsyncServer:
         timeout: int = 60,
         ignore_queue: bool = False,
     ) -> DataOrTuple:
+        await self.flush_batches()
         return cast(
             DataOrTuple,
             await self.backend.call(
@@ -135,6 +303,8 @@ class AsyncServer:
 
 
 class AsyncSocket:
+    __slots__ = ("server", "sid")
+
     def __init__(self, server: AsyncServer, sid: str) -> None:
         self.server = server
         self.sid = sid
@@ -144,8 +314,8 @@ class AsyncSocket:
         event: str,
         # TODO proper support for pydantic `data`
         data: DataType | tuple[DataType, ...] | dict[str, Any],
-        target: str | None = None,
-        skip_sid: str | None = None,
+        target: Recipients = None,
+        skip_sid: Recipients = None,
         exclude_self: bool = False,
         namespace: str | None = None,
         callback: CallbackProtocol | None = None,
@@ -155,17 +325,32 @@ class AsyncSocket:
             event=event,
             data=data,
             target=target,
-            skip_sid=skip_sid or (self.sid if exclude_self else None),
+            skip_sid=exclude_sid(skip_sid, self.sid) if exclude_self else skip_sid,
             namespace=namespace,
             callback=callback,
             ignore_queue=ignore_queue,
         )
 
+    async def emit_prepared(
+        self,
+        prepared: PreparedEvent,
+        target: Recipients = None,
+        skip_sid: Recipients = None,
+        exclude_self: bool = False,
+        ignore_queue: bool = False,
+    ) -> None:
+        await self.server.emit_prepared(
+            prepared=prepared,
+            target=target,
+            skip_sid=exclude_sid(skip_sid, self.sid) if exclude_self else skip_sid,
+            ignore_queue=ignore_queue,
+        )
+
     async def send(
         self,
         data: DataOrTuple,
-        target: str | None = None,
-        skip_sid: str | None = None,
+        target: Recipients = None,
+        skip_sid: Recipients = None,
         exclude_self: bool = False,
         namespace: str | None = None,
         callback: CallbackProtocol | None = None,
@@ -174,7 +359,7 @@ class AsyncSocket:
         await self.server.send(
             data=data,
             target=target,
-            skip_sid=skip_sid or self.sid if exclude_self else None,
+            skip_sid=exclude_sid(skip_sid, self.sid) if exclude_self else skip_sid,
             namespace=namespace,
             callback=callback,
             ignore_queue=ignore_queue,
@@ -249,25 +434,38 @@ T = TypeVar("T")
 
 
 class Emitter(Generic[T]):
+    __slots__ = ("socket", "event_name", "adapter", "trusted_type")
+
     def __init__(
         self,
         socket: AsyncSocket,
         event_name: str,
         adapter: TypeAdapter[Any],
+        trusted_type: type[Any] | None = None,
     ) -> None:
         self.socket = socket
         self.event_name = event_name
         self.adapter = adapter
+        self.trusted_type = trusted_type
+
+    def validate_data(self, data: T) -> T:
+        if self.trusted_type is None or not isinstance(data, self.trusted_type):
+            return cast(T, self.adapter.validate_python(data))
+        return data
+
+    def serialize_data(self, data: T) -> Any:
+        if self.socket.server.supports_raw_json:
+            return RawJSON(self.adapter.dump_json(data).decode())
+        return self.adapter.dump_python(data, mode="json")
 
     def dump_data(self, data: T) -> Any:
-        validated_data = self.adapter.validate_python(data)
-        return self.adapter.dump_python(validated_data, mode="json")
+        return self.serialize_data(self.validate_data(data))
 
     async def emit(
         self,
         data: T,
-        target: str | None = None,
-        skip_sid: str | None = None,
+        target: Recipients = None,
+        skip_sid: Recipients = None,
         exclude_self: bool = False,
         namespace: str | None = None,
         callback: CallbackProtocol | None = None,
@@ -284,6 +482,29 @@ class Emitter(Generic[T]):
             ignore_queue=ignore_queue,
         )
 
+    def prepare(self, data: T, namespace: str | None = None) -> PreparedEvent:
+        return self.socket.server.prepare(
+            event=self.event_name,
+            data=self.dump_data(data),
+            namespace=namespace,
+        )
+
+    async def emit_prepared(
+        self,
+        prepared: PreparedEvent,
+        target: Recipients = None,
+        skip_sid: Recipients = None,
+        exclude_self: bool = False,
+        ignore_queue: bool = False,
+    ) -> None:
+        await self.socket.emit_prepared(
+            prepared=prepared,
+            target=target,
+            skip_sid=skip_sid,
+            exclude_self=exclude_self,
+            ignore_queue=ignore_queue,
+        )
+
     async def call(
         self,
         data: T,
@@ -1,10 +1,13 @@
 from __future__ import annotations
 
+from tmexio.packets import RawArguments
 from tmexio.server import AsyncServer, AsyncSocket
 from tmexio.types import DataType
 
 
 class ClientEvent:
+    __slots__ = ("event_name", "sid", "server", "raw_args", "_args", "_socket")
+
     def __init__(
         self,
         server: AsyncServer,
@@ -15,5 +18,22 @@ class ClientEvent:
         self.event_name = event_name
         self.sid = sid
         self.server = server
-        self.socket = AsyncSocket(server=server, sid=sid)
-        self.args = args
+        self._socket: AsyncSocket | None = None
+
+        self.raw_args: RawArguments | None = None
+        self._args: tuple[DataType, ...] | None = args
+        if len(args) == 1 and isinstance(args[0], RawArguments):
+            self.raw_args = args[0]
+            self._args = None
+
+    @property
+    def args(self) -> tuple[DataType, ...]:
+        if self._args is None:
+            self._args = tuple(self.raw_args.decode()) if self.raw_args else ()
+        return self._args
+
+    @property
+    def socket(self) -> AsyncSocket:
+        if self._socket is None:
+            self._socket = AsyncSocket(server=self.server, sid=self.sid)
+        return self._socket
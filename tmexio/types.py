@@ -1,14 +1,18 @@
-from collections.abc import Awaitable, Callable, MutableMapping
-from typing import Any, Protocol
+from collections.abc import Awaitable, Callable, MutableMapping, Sequence
+from dataclasses import is_dataclass
+from typing import Any, Literal, Protocol
 
 from pydantic import BaseModel, TypeAdapter
 
 AnyKwargs = dict[str, Any]
 AnyCallable = Callable[..., Any]
 DependencyCacheKey = AnyCallable
+DependencyScope = Literal["event", "connection"]
+ValidationDetail = Literal["full", "compact", "code"]
 
 DataType = None | int | str | bytes | dict["DataType", "DataType"] | list["DataType"]
 DataOrTuple = DataType | tuple[DataType, ...]
+Recipients = str | Sequence[str] | None
 
 
 class CallbackProtocol(Protocol):
@@ -29,3 +33,12 @@ class ASGIAppProtocol(Protocol):
 
 
 ModelType = TypeAdapter[Any] | type[BaseModel]
+
+
+def trusted_type_of(annotation: Any) -> type[Any] | None:
+    # only classes with reliable instance checks (not TypedDicts, protocols, etc.)
+    if isinstance(annotation, type) and (
+        issubclass(annotation, BaseModel) or is_dataclass(annotation)
+    ):
+        return annotation
+    return None